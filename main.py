@@ -4,16 +4,22 @@ import sys
 
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.redis import RedisStorage
-from redis.asyncio import Redis
 
 from src.config import config
 from src.database.db import db
+from src.database.redis_cache import redis
 from src.handlers.admin import admin_router
 from src.handlers.analytics import analytics_router
 from src.handlers.cart import cart_router
 from src.handlers.catalog import catalog_router
 from src.handlers.common import common_router
+from src.handlers.inline import inline_router
+from src.middlewares.auth import UserMiddleware
 from src.middlewares.logger import LoggingMiddleware
+from src.services.cart_store import cart_store
+from src.services.cleaner import cart_cleaner
+from src.services.orders import order_service
+from src.services.search_index import search_index
 from src.services.notifier import logger, notifier
 
 
@@ -25,10 +31,10 @@ async def main():
     # Реєструємо ігнорування SIGINT (Ctrl+C)
     signal.signal(signal.SIGINT, signal_handler)
 
-    redis = Redis.from_url(config.REDIS_DSN)
     storage = RedisStorage(redis=redis)
     bot = Bot(token=config.BOT_TOKEN)
     dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(UserMiddleware())
     dp.update.middleware(LoggingMiddleware())
 
     dp.include_router(common_router)
@@ -36,22 +42,33 @@ async def main():
     dp.include_router(cart_router)
     dp.include_router(analytics_router)
     dp.include_router(catalog_router)
+    dp.include_router(inline_router)
 
     @dp.startup.register
     async def on_startup():
         await db.connect()
+        if config.SEARCH_BACKEND == "index":
+            await search_index.load_from_db()
         try:
             await redis.ping()
             logger.info("Redis connected successfully")
         except Exception:
             logger.error("Redis connection failed")
+        await cart_store.start()
+        await order_service.start(bot)
+        cart_cleaner.start()
         await notifier.info(bot, "🚀 <b>Бот успішно запущено!</b>")
 
     @dp.shutdown.register
     async def on_shutdown():
+        cart_cleaner.stop()
+        order_service.stop()
+        await cart_store.stop()
         await db.disconnect()
         await redis.close()
         await notifier.warning(bot, "💤 <b>Бот зупиняється...</b>")
+        # Решта черги сповіщень — до закриття сесії бота
+        await notifier.stop()
 
     logger.info("Starting bot polling... (Ctrl+C disabled)")
     await bot.delete_webhook(drop_pending_updates=True)
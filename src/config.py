@@ -33,7 +33,42 @@ class Config:
     POSTGRES_DSN = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     REDIS_DSN = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
 
+    # Кеш користувачів/ролей: L1 (в процесі) та L2 (Redis), секунди
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 60))
+    USER_REDIS_TTL = int(os.getenv("USER_REDIS_TTL", 600))
+
+    # Кошик у Redis з відкладеним записом у Postgres (write-behind)
+    CART_REDIS_TTL = int(os.getenv("CART_REDIS_TTL", 7 * 24 * 3600))
+    CART_FLUSH_INTERVAL = float(os.getenv("CART_FLUSH_INTERVAL", 2))
+    CART_FLUSH_BATCH = int(os.getenv("CART_FLUSH_BATCH", 200))
+    # Через скільки секунд без змін кошик магазину перестає резервувати товар
+    # (має бути менше за CART_REDIS_TTL, щоб резерв знімався до зникнення кошика з Redis)
+    CART_RESERVATION_TTL = int(os.getenv("CART_RESERVATION_TTL", 24 * 3600))
+    # Покинуті кошики: скільки секунд без змін до видалення, як часто прибирати і розмір пачки
+    CART_IDLE_TTL = int(os.getenv("CART_IDLE_TTL", 30 * 24 * 3600))
+    CART_CLEANUP_INTERVAL = int(os.getenv("CART_CLEANUP_INTERVAL", 3600))
+    CART_CLEANUP_BATCH = int(os.getenv("CART_CLEANUP_BATCH", 500))
+
+    # Історія імпортів: скільки місяців зберігати і за скільки тижнів рахувати швидкість продажів
+    HISTORY_RETENTION_MONTHS = int(os.getenv("HISTORY_RETENTION_MONTHS", 24))
+    HISTORY_VELOCITY_WEEKS = int(os.getenv("HISTORY_VELOCITY_WEEKS", 8))
+
+    # Готові файли звітів у пам'яті: сумарний ліміт, байт
+    REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+    # Дедуплікація важких запитів: максимальний час обчислення під блокуванням
+    # і скільки секунд результат доступний іншим процесам
+    SINGLE_FLIGHT_LOCK_TTL = int(os.getenv("SINGLE_FLIGHT_LOCK_TTL", 300))
+    SINGLE_FLIGHT_RESULT_TTL = int(os.getenv("SINGLE_FLIGHT_RESULT_TTL", 30))
+
     # --- БІЗНЕС-ЛОГІКА ---
+    # Автозамовлення: за скільки днів продажі у файлі імпорту, час поставки,
+    # період до наступного замовлення і страховий запас (у днях продажів)
+    AUTO_ORDER_PERIOD_DAYS = float(os.getenv("AUTO_ORDER_PERIOD_DAYS", 30))
+    AUTO_ORDER_LEAD_DAYS = float(os.getenv("AUTO_ORDER_LEAD_DAYS", 7))
+    AUTO_ORDER_REVIEW_DAYS = float(os.getenv("AUTO_ORDER_REVIEW_DAYS", 20))
+    AUTO_ORDER_SAFETY_DAYS = float(os.getenv("AUTO_ORDER_SAFETY_DAYS", 3))
+
     # Незгораний залишок для магазинів
     STOCK_RESERVE = int(os.getenv("STOCK_RESERVE", 3))
     
@@ -44,6 +79,45 @@ class Config:
     # Максимальна кількість товару в одному рядку замовлення (захист від дурня)
     MAX_ORDER_QTY = int(os.getenv("MAX_ORDER_QUANTITY", 1000))
 
+    # Максимум рядків у масовому додаванні в кошик (список / csv / xlsx)
+    BULK_MAX_LINES = int(os.getenv("BULK_MAX_LINES", 500))
+
+    # Рядків кошика на одній сторінці (ліміт повідомлення Telegram — 4096 символів)
+    CART_PAGE_SIZE = int(os.getenv("CART_PAGE_SIZE", 20))
+
+    # Масові розсилки користувачам (повідомлень за секунду; ліміт Telegram ~30/с)
+    NOTIFY_RATE = float(os.getenv("NOTIFY_RATE", 20))
+    # Черга сповіщень: вікно склеювання, мінімальна пауза між повідомленнями в один чат
+    # (група — ~20/хв), максимум очікуючих на чат (решта відкидається з лічильником), секунд на дочищення при зупинці
+    NOTIFY_COALESCE_WINDOW = float(os.getenv("NOTIFY_COALESCE_WINDOW", 1.0))
+    NOTIFY_CHAT_INTERVAL = float(os.getenv("NOTIFY_CHAT_INTERVAL", 3.0))
+    NOTIFY_MAX_PENDING = int(os.getenv("NOTIFY_MAX_PENDING", 100))
+    NOTIFY_FLUSH_TIMEOUT = float(os.getenv("NOTIFY_FLUSH_TIMEOUT", 10))
+
+    # Фонова генерація замовлень: спроб до статусу failed, пауза перед повтором
+    # (подвоюється з кожною спробою) і інтервал опитування черги, секунди
+    ORDER_MAX_ATTEMPTS = int(os.getenv("ORDER_MAX_ATTEMPTS", 5))
+    ORDER_RETRY_DELAY = int(os.getenv("ORDER_RETRY_DELAY", 30))
+    ORDER_POLL_INTERVAL = float(os.getenv("ORDER_POLL_INTERVAL", 5))
+
+    # Пошук: "index" (in-memory індекс, будується при імпорті) або "db" (ILIKE по таблиці)
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "index")
+    # LRU недавніх пошукових запитів (спільний для FSM-пошуку та inline-режиму)
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 2000))
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 600))
+    # cache_time для відповідей на inline-запити (кеш на стороні Telegram), секунди
+    INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", 60))
+
+    # Кеш відрендерених екранів каталогу (скидається після кожного імпорту)
+    SCREEN_CACHE_SIZE = int(os.getenv("SCREEN_CACHE_SIZE", 5000))
+    SCREEN_CACHE_TTL = int(os.getenv("SCREEN_CACHE_TTL", 3600))
+    # Спекулятивне прогрівання дочірніх екранів: глибина (0 — вимкнено), скільки дітей
+    # одного рівня, паралельних рендерів і фонових задач одночасно
+    PREFETCH_DEPTH = int(os.getenv("PREFETCH_DEPTH", 1))
+    PREFETCH_MAX_CHILDREN = int(os.getenv("PREFETCH_MAX_CHILDREN", 8))
+    PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", 2))
+    PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", 20))
+
     def log_config(self):
         """Виводить поточну конфігурацію в лог, маскуючи секретні дані"""
         # Маскуємо токен
@@ -60,6 +134,7 @@ class Config:
         logger.info(f"🧠 REDIS: {self.REDIS_HOST}:{self.REDIS_PORT}")
         logger.info(f"📊 FILTERS: Sales >= {self.MIN_SALES} OR Stock >= {self.MIN_STOCK}")
         logger.info(f"📦 RULES: Reserve={self.STOCK_RESERVE} | MaxQty={self.MAX_ORDER_QTY}")
+        logger.info(f"🔎 SEARCH: {self.SEARCH_BACKEND} | Cache={self.SEARCH_CACHE_SIZE}/{self.SEARCH_CACHE_TTL}s | Inline cache_time={self.INLINE_CACHE_TIME}s")
         logger.info("========================================")
 
 # Створюємо глобальний екземпляр
@@ -1,6 +1,7 @@
 import asyncpg
 from loguru import logger
 from src.config import config
+from src.database.migrations import apply_migrations, check_query_plans
 
 class Database:
     def __init__(self):
@@ -34,68 +35,12 @@ class Database:
             logger.info("💤 DB Connection closed.")
 
     async def create_tables(self):
-        """Створює та оновлює структуру БД"""
+        """Застосовує версіоновані міграції (див. src/database/migrations.py)"""
         logger.info("🛠 Checking database schema...")
-        
-        # 1. Створення таблиць (якщо їх немає)
-        create_queries = [
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                user_id BIGINT PRIMARY KEY,
-                username TEXT,
-                full_name TEXT,
-                role VARCHAR(20) DEFAULT 'shop',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS products (
-                article VARCHAR(50) PRIMARY KEY,
-                name TEXT,
-                department INTEGER,
-                category_path TEXT,
-                supplier TEXT,
-                resident TEXT,
-                cluster VARCHAR(10),  
-                sales_qty REAL DEFAULT 0,
-                sales_sum REAL DEFAULT 0,
-                stock_qty REAL DEFAULT 0,
-                stock_sum REAL DEFAULT 0,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS cart (
-                user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
-                article VARCHAR(50) REFERENCES products(article) ON DELETE CASCADE,
-                quantity INTEGER,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (user_id, article)
-            );
-            """
-        ]
-        
-        # 2. Міграції (додавання колонок у вже існуючі таблиці)
-        # Використовуємо IF NOT EXISTS, щоб не було помилок
-        migration_queries = [
-            "ALTER TABLE users ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;",
-            "ALTER TABLE users ADD COLUMN IF NOT EXISTS role VARCHAR(20) DEFAULT 'shop';",
-            "ALTER TABLE products ADD COLUMN IF NOT EXISTS cluster VARCHAR(10);"
-        ]
-        
+
         async with self.pool.acquire() as connection:
-            # Створення
-            for q in create_queries:
-                await connection.execute(q)
-            
-            # Міграція
-            for q in migration_queries:
-                try:
-                    await connection.execute(q)
-                except Exception as e:
-                    logger.warning(f"Migration warning: {e}")
-        
-        logger.info("📦 DB Schema verified/updated successfully.")
+            await apply_migrations(connection)
+            await check_query_plans(connection)
 
     # --- Методи для простих запитів (Auto-commit) ---
     
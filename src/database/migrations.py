@@ -0,0 +1,379 @@
+import re
+
+from loguru import logger
+
+# --- ВЕРСІОНОВАНІ МІГРАЦІЇ ---
+# Кожна міграція застосовується рівно один раз і записується в schema_version.
+# Нові зміни схеми — ТІЛЬКИ новим елементом у кінці списку (старі не редагуємо).
+# concurrent=True: запити виконуються поза транзакцією (потрібно для CREATE INDEX CONCURRENTLY,
+# щоб не блокувати запис у таблиці на великих базах).
+
+MIGRATIONS = [
+    {
+        "version": 1,
+        "name": "initial schema",
+        "queries": [
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id BIGINT PRIMARY KEY,
+                username TEXT,
+                full_name TEXT,
+                role VARCHAR(20) DEFAULT 'shop',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS products (
+                article VARCHAR(50) PRIMARY KEY,
+                name TEXT,
+                department INTEGER,
+                category_path TEXT,
+                supplier TEXT,
+                resident TEXT,
+                cluster VARCHAR(10),
+                sales_qty REAL DEFAULT 0,
+                sales_sum REAL DEFAULT 0,
+                stock_qty REAL DEFAULT 0,
+                stock_sum REAL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS cart (
+                user_id BIGINT REFERENCES users(user_id) ON DELETE CASCADE,
+                article VARCHAR(50) REFERENCES products(article) ON DELETE CASCADE,
+                quantity INTEGER,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, article)
+            );
+            """,
+            # Колонки, що додавались до старих баз до появи версіонування
+            "ALTER TABLE users ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;",
+            "ALTER TABLE users ADD COLUMN IF NOT EXISTS role VARCHAR(20) DEFAULT 'shop';",
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS cluster VARCHAR(10);",
+        ],
+    },
+    {
+        "version": 2,
+        "name": "categories",
+        "queries": [
+            """
+            CREATE TABLE IF NOT EXISTS categories (
+                id SERIAL PRIMARY KEY,
+                parent_id INTEGER REFERENCES categories(id) ON DELETE CASCADE,
+                department INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                depth SMALLINT NOT NULL,
+                UNIQUE NULLS NOT DISTINCT (department, parent_id, name)
+            );
+            """,
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS category_id INTEGER REFERENCES categories(id) ON DELETE SET NULL;",
+            "CREATE INDEX IF NOT EXISTS idx_categories_roots ON categories (department, name) WHERE parent_id IS NULL;",
+            "CREATE INDEX IF NOT EXISTS idx_categories_parent ON categories (parent_id, name);",
+        ],
+    },
+    {
+        "version": 3,
+        "name": "performance indexes",
+        "concurrent": True,
+        "queries": [
+            # Каталог: товари категорії / товари відділу без категорії
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_category ON products (category_id, name);",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_uncategorized ON products (department, name) WHERE category_id IS NULL;",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_products_department ON products (department);",
+            # Адмінка: список користувачів
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_created_at ON users (created_at DESC);",
+            # Кошик: каскадне видалення при видаленні товарів
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cart_article ON cart (article);",
+        ],
+    },
+    {
+        "version": 4,
+        "name": "unit price",
+        "queries": [
+            # Ціна за одиницю рахується Postgres один раз при записі (імпорті), а не на кожен рендер
+            """
+            ALTER TABLE products ADD COLUMN IF NOT EXISTS unit_price REAL
+                GENERATED ALWAYS AS (CASE WHEN stock_qty > 0 THEN stock_sum / stock_qty ELSE 0 END) STORED;
+            """,
+        ],
+    },
+    {
+        "version": 5,
+        "name": "orders",
+        "queries": [
+            # status: pending -> processing -> done | failed (після ORDER_MAX_ATTEMPTS спроб)
+            # files_sent: скільки файлів уже доставлено (повтор не шле їх вдруге)
+            """
+            CREATE TABLE IF NOT EXISTS orders (
+                id BIGSERIAL PRIMARY KEY,
+                user_id BIGINT REFERENCES users(user_id) ON DELETE SET NULL,
+                chat_id BIGINT NOT NULL,
+                grouping_mode VARCHAR(20) NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                files_sent INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """,
+            # Рядки — знімок товару на момент замовлення (без FK: імпорт може видалити товар)
+            """
+            CREATE TABLE IF NOT EXISTS order_items (
+                order_id BIGINT REFERENCES orders(id) ON DELETE CASCADE,
+                article VARCHAR(50),
+                name TEXT,
+                department INTEGER,
+                supplier TEXT,
+                quantity INTEGER,
+                unit_price REAL,
+                PRIMARY KEY (order_id, article)
+            );
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_orders_queue ON orders (next_attempt_at) WHERE status IN ('pending', 'processing');",
+            "CREATE INDEX IF NOT EXISTS idx_orders_user ON orders (user_id, created_at DESC);",
+        ],
+    },
+    {
+        "version": 6,
+        "name": "cart idle index",
+        "concurrent": True,
+        "queries": [
+            # Прибирання покинутих кошиків пачками від найстаріших
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cart_updated_at ON cart (updated_at);",
+        ],
+    },
+    {
+        "version": 7,
+        "name": "pack size",
+        "queries": [
+            # Кратність упаковки для округлення автозамовлення (колонка "Кратність" у файлі імпорту)
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS pack_size INTEGER NOT NULL DEFAULT 1;",
+        ],
+    },
+    {
+        "version": 8,
+        "name": "sales statistics",
+        "queries": [
+            # Кількість імпортів, середнє і сума квадратів відхилень sales_qty (для XYZ-аналізу)
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS sales_n INTEGER NOT NULL DEFAULT 0;",
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS sales_mean DOUBLE PRECISION NOT NULL DEFAULT 0;",
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS sales_m2 DOUBLE PRECISION NOT NULL DEFAULT 0;",
+            "UPDATE products SET sales_n = 1, sales_mean = sales_qty WHERE sales_n = 0;",
+        ],
+    },
+    {
+        "version": 9,
+        "name": "product history",
+        "queries": [
+            # Знімок кожного імпорту; секції по місяцях створює/видаляє HistoryService
+            """
+            CREATE TABLE IF NOT EXISTS product_history (
+                article VARCHAR(50) NOT NULL,
+                snapshot_date DATE NOT NULL,
+                sales_qty REAL,
+                sales_sum REAL,
+                stock_qty REAL,
+                stock_sum REAL,
+                PRIMARY KEY (article, snapshot_date)
+            ) PARTITION BY RANGE (snapshot_date);
+            """,
+        ],
+    },
+    {
+        "version": 10,
+        "name": "summary tables",
+        "queries": [
+            # Зведення по відділах/постачальниках — перераховуються при імпорті (SummaryService)
+            """
+            CREATE TABLE IF NOT EXISTS department_summary (
+                department INTEGER PRIMARY KEY,
+                product_count INTEGER NOT NULL,
+                stock_value DOUBLE PRECISION NOT NULL,
+                sales_value DOUBLE PRECISION NOT NULL
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS supplier_summary (
+                supplier TEXT PRIMARY KEY,
+                product_count INTEGER NOT NULL,
+                stock_value DOUBLE PRECISION NOT NULL,
+                sales_value DOUBLE PRECISION NOT NULL
+            );
+            """,
+            # Загальні лічильники: products/stock_value/sales_value — з імпорту, users — тригером
+            """
+            CREATE TABLE IF NOT EXISTS summary_totals (
+                key TEXT PRIMARY KEY,
+                value DOUBLE PRECISION NOT NULL DEFAULT 0
+            );
+            """,
+            """
+            CREATE OR REPLACE FUNCTION count_users() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    UPDATE summary_totals SET value = value + 1 WHERE key = 'users';
+                ELSE
+                    UPDATE summary_totals SET value = value - 1 WHERE key = 'users';
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+            """,
+            "CREATE OR REPLACE TRIGGER users_count AFTER INSERT OR DELETE ON users FOR EACH ROW EXECUTE FUNCTION count_users();",
+            # Початкове заповнення для вже існуючої бази
+            "INSERT INTO summary_totals (key, value) SELECT 'users', count(*) FROM users ON CONFLICT (key) DO NOTHING;",
+            """
+            INSERT INTO summary_totals (key, value)
+            SELECT unnest(ARRAY['products', 'stock_value', 'sales_value']),
+                   unnest(ARRAY[count(*), coalesce(sum(stock_sum), 0), coalesce(sum(sales_sum), 0)]::double precision[])
+            FROM products
+            ON CONFLICT (key) DO NOTHING;
+            """,
+            """
+            INSERT INTO department_summary
+            SELECT department, count(*), coalesce(sum(stock_sum), 0), coalesce(sum(sales_sum), 0)
+            FROM products WHERE department IS NOT NULL GROUP BY department
+            ON CONFLICT (department) DO NOTHING;
+            """,
+            """
+            INSERT INTO supplier_summary
+            SELECT coalesce(supplier, ''), count(*), coalesce(sum(stock_sum), 0), coalesce(sum(sales_sum), 0)
+            FROM products GROUP BY coalesce(supplier, '')
+            ON CONFLICT (supplier) DO NOTHING;
+            """,
+        ],
+    },
+    {
+        "version": 11,
+        "name": "store stock",
+        "queries": [
+            # Магазин користувача (NULL — працює із загальним залишком products)
+            "ALTER TABLE users ADD COLUMN IF NOT EXISTS store_id INTEGER;",
+            # Залишки/продажі по магазинах; секцію на магазин створює StoreStockService при імпорті
+            """
+            CREATE TABLE IF NOT EXISTS store_stock (
+                store_id INTEGER NOT NULL,
+                article VARCHAR(50) NOT NULL,
+                sales_qty REAL NOT NULL DEFAULT 0,
+                sales_sum REAL NOT NULL DEFAULT 0,
+                stock_qty REAL NOT NULL DEFAULT 0,
+                stock_sum REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (store_id, article)
+            ) PARTITION BY LIST (store_id);
+            """,
+        ],
+    },
+    {
+        "version": 12,
+        "name": "sales stats date",
+        "queries": [
+            # День останньої вибірки у статистиці продажів: повторний імпорт того ж дня її не дублює
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS sales_stats_date DATE;",
+            "UPDATE products SET sales_stats_date = updated_at::date WHERE sales_stats_date IS NULL;",
+        ],
+    },
+]
+
+# Довільний ключ advisory lock, щоб два процеси не мігрували одночасно
+MIGRATION_LOCK_KEY = 72_531_001
+
+CONCURRENT_INDEX = re.compile(r"INDEX CONCURRENTLY IF NOT EXISTS (\w+)", re.IGNORECASE)
+
+
+async def apply_migrations(connection):
+    """Застосовує всі ще не застосовані міграції по порядку"""
+    await connection.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+    await connection.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_KEY)
+    try:
+        applied = {r['version'] for r in await connection.fetch("SELECT version FROM schema_version")}
+        pending = [m for m in MIGRATIONS if m['version'] not in applied]
+
+        if not pending:
+            logger.info(f"📦 DB Schema is up to date (version {max(applied)}).")
+            return
+
+        for migration in pending:
+            logger.info(f"🛠 Applying migration {migration['version']}: {migration['name']}...")
+
+            if migration.get('concurrent'):
+                for q in migration['queries']:
+                    await _drop_invalid_index(connection, q)
+                    await connection.execute(q)
+                await connection.execute(
+                    "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                    migration['version'], migration['name']
+                )
+            else:
+                async with connection.transaction():
+                    for q in migration['queries']:
+                        await connection.execute(q)
+                    await connection.execute(
+                        "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                        migration['version'], migration['name']
+                    )
+
+        logger.info(f"📦 DB Schema migrated to version {pending[-1]['version']}.")
+    finally:
+        await connection.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
+
+
+async def _drop_invalid_index(connection, query: str):
+    """
+    Якщо попередній CREATE INDEX CONCURRENTLY впав посередині, лишається INVALID індекс,
+    який IF NOT EXISTS мовчки пропустить. Видаляємо його перед повтором.
+    """
+    match = CONCURRENT_INDEX.search(query)
+    if not match:
+        return
+    invalid = await connection.fetchval("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = $1 AND NOT i.indisvalid
+    """, match.group(1))
+    if invalid:
+        logger.warning(f"Dropping invalid index {match.group(1)} left by an interrupted migration")
+        await connection.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}")
+
+
+# --- ПЕРЕВІРКА ПЛАНІВ ГАРЯЧИХ ЗАПИТІВ ---
+# (назва, запит, аргументи, індекс, який має використовуватись)
+HOT_QUERIES = [
+    ("catalog: products of category",
+     "SELECT article, name FROM products WHERE category_id = $1 ORDER BY name LIMIT 10",
+     (1,), "idx_products_category"),
+    ("catalog: sub-categories",
+     "SELECT id, name FROM categories WHERE parent_id = $1 ORDER BY name",
+     (1,), "idx_categories_parent"),
+    ("admin: users page",
+     "SELECT user_id FROM users ORDER BY created_at DESC LIMIT 10 OFFSET 0",
+     (), "idx_users_created_at"),
+    ("cleanup: idle carts",
+     "SELECT ctid FROM cart WHERE updated_at < CURRENT_TIMESTAMP - interval '30 days' ORDER BY updated_at LIMIT 500",
+     (), "idx_cart_updated_at"),
+]
+
+
+async def check_query_plans(connection) -> list[str]:
+    """
+    EXPLAIN гарячих запитів: повертає (і логує) ті, що не можуть використати свій індекс.
+    Seq scan вимикається, бо на маленькій таблиці планувальник і так обере його —
+    нас цікавить, чи індекс взагалі придатний для запиту.
+    """
+    problems = []
+    async with connection.transaction():
+        await connection.execute("SET LOCAL enable_seqscan = off")
+        for name, query, args, index in HOT_QUERIES:
+            plan = "\n".join(r[0] for r in await connection.fetch(f"EXPLAIN {query}", *args))
+            if index not in plan:
+                problems.append(name)
+                logger.warning(f"🐢 Query plan for '{name}' does not use {index}:\n{plan}")
+    return problems
@@ -0,0 +1,6 @@
+from redis.asyncio import Redis
+
+from src.config import config
+
+# Спільний клієнт Redis (FSM-сховище, кеші, блокування)
+redis = Redis.from_url(config.REDIS_DSN)
@@ -1,11 +1,13 @@
 import os
 from aiogram import Router, F, types
-from aiogram.types import FSInputFile
+from aiogram.types import BufferedInputFile
 from aiogram.fsm.context import FSMContext
 from loguru import logger
 
 from src.database.db import db
 from src.services.exporter import exporter
+from src.services.importer import importer
+from src.services.single_flight import single_flight
 from src.keyboards.admin_kb import get_export_filter_keyboard
 
 router = Router()
@@ -26,6 +28,25 @@ async def show_export_menu(callback: types.CallbackQuery):
 
 # --- ЛОГІКА ЕКСПОРТУ ---
 
+async def build_full_export() -> tuple[str, bytes, int] | None:
+    """Файл повної бази: (ім'я, байти, кількість товарів) або None, якщо база порожня"""
+    # 1. Отримуємо всі товари з бази
+    records = await db.fetch_all("SELECT * FROM products ORDER BY department, name")
+    if not records:
+        return None
+
+    # 🔥 ВИПРАВЛЕННЯ: Конвертуємо Record у dict, щоб pandas бачив назви колонок
+    items = [dict(r) for r in records]
+
+    # 2. Генеруємо файл (з кольоровим стовпчиком DP) і забираємо його з диска
+    file_path = await exporter.export_full_base(items)
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    finally:
+        exporter.cleanup([file_path])
+    return os.path.basename(file_path), data, len(items)
+
 @router.callback_query(F.data == "export_all")
 async def run_export_all(callback: types.CallbackQuery):
     """Експорт всієї бази товарів"""
@@ -34,34 +55,23 @@ async def run_export_all(callback: types.CallbackQuery):
     try:
         logger.info(f"📤 Full Export requested by {callback.from_user.id}")
         
-        # 1. Отримуємо всі товари з бази
-        records = await db.fetch_all("SELECT * FROM products ORDER BY department, name")
+        # Одночасні запити (подвійний клік, кілька адмінів) чекають один і той самий файл
+        export = await single_flight.run(f"export_all:{await importer.current_generation()}", build_full_export)
         
-        if not records:
+        if not export:
             await status_msg.edit_text("❌ База даних порожня.")
             return
 
-        # 🔥 ВИПРАВЛЕННЯ: Конвертуємо Record у dict, щоб pandas бачив назви колонок
-        items = [dict(r) for r in records]
-
-        # 2. Генеруємо файл (з кольоровим стовпчиком DP)
-        file_path = await exporter.export_full_base(items)
-        
         # 3. Відправляємо файл
-        input_file = FSInputFile(file_path)
+        filename, data, count = export
         await callback.message.answer_document(
-            document=input_file,
-            caption=f"📦 <b>Повний експорт бази</b>\nТоварів: {len(items)}\n<i>(З урахуванням ABC-аналізу)</i>",
+            document=BufferedInputFile(data, filename=filename),
+            caption=f"📦 <b>Повний експорт бази</b>\nТоварів: {count}\n<i>(З урахуванням ABC-аналізу)</i>",
             parse_mode="HTML"
         )
         
-        # 4. Прибираємо повідомлення про статус і видаляємо файл з диска
+        # 4. Прибираємо повідомлення про статус
         await status_msg.delete()
-        
-        try:
-            os.remove(file_path)
-        except Exception:
-            pass
 
     except Exception as e:
         logger.error(f"Export failed: {e}")
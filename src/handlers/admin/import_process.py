@@ -1,6 +1,6 @@
 import os
 import time
-from aiogram import Router, F, types, Bot
+from aiogram import Router, F, html, types, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from loguru import logger
@@ -8,6 +8,8 @@ from loguru import logger
 from src.config import config
 from src.services.importer import importer
 from src.services.notifier import notifier
+from src.services.reports import report_service
+from src.services.store_stock import store_from_filename, store_stock
 from src.utils.text_parsers import transform_drive_url
 from src.utils.files import download_file
 
@@ -25,6 +27,7 @@ async def on_import_file_btn(callback: types.CallbackQuery, state: FSMContext):
     await callback.message.edit_text(
         "📥 <b>Завантаження файлу</b>\n\n"
         "Будь ласка, надішліть файл <code>.xlsx</code> або <code>.csv</code>.\n"
+        "<i>Залишки окремого магазину — файл з назвою <code>store_&lt;номер&gt;...</code></i>\n"
         "<i>Максимальний розмір: 20 МБ.</i>",
         parse_mode="HTML",
         reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[
@@ -118,8 +121,51 @@ async def handle_import_link(message: types.Message, state: FSMContext):
 
 # --- ГОЛОВНА ЛОГІКА ІМПОРТУ ---
 
+def build_cart_adjustment_messages(adjustments: list) -> list[tuple[int, str]]:
+    """Рядки, урізані реконсиляцією кошиків -> [(user_id, текст)]"""
+    by_user: dict[int, list[str]] = {}
+    for r in adjustments:
+        change = f"{r['old_qty']} → {r['new_qty']} шт." if r['new_qty'] > 0 else "видалено (немає в наявності)"
+        by_user.setdefault(r['user_id'], []).append(f"▫️ {html.quote(r['name'] or r['article'])}: {change}")
+
+    messages = []
+    for user_id, lines in by_user.items():
+        more = f"\n… і ще {len(lines) - 30}" if len(lines) > 30 else ""
+        messages.append((user_id, "⚠️ <b>Залишки оновлено, ваш кошик скориговано:</b>\n" + "\n".join(lines[:30]) + more))
+    return messages
+
+async def process_store_import(status_msg: types.Message, file_path: str, store_id: int):
+    """Файл залишків магазину: замінює лише його секцію store_stock"""
+    await status_msg.edit_text(f"📖 <b>Залишки магазину №{store_id}:</b> читання та запис...", parse_mode="HTML")
+    try:
+        count = await store_stock.import_file(file_path, store_id)
+        await status_msg.edit_text(
+            f"✅ <b>Залишки магазину №{store_id} оновлено!</b>\n"
+            f"📊 Позицій: <b>{count}</b>\n"
+            f"📁 Файл: <code>{os.path.basename(file_path)}</code>",
+            parse_mode="HTML"
+        )
+        await notifier.info(status_msg.bot, f"🏪 <b>Імпорт магазину №{store_id} OK</b>\nФайл: {os.path.basename(file_path)}\nКількість: {count}")
+        notifier.queue_batch(status_msg.bot, build_cart_adjustment_messages(store_stock.cart_adjustments))
+
+        if "data/temp" in file_path:
+            try: os.remove(file_path)
+            except: pass
+
+    except Exception as e:
+        logger.error(f"❌ Store import failed: {e}")
+        await status_msg.edit_text(f"❌ <b>Помилка імпорту магазину</b>\n<code>{e}</code>", parse_mode="HTML")
+
 async def process_import(status_msg: types.Message, file_path: str):
     logger.info(f"⚙️ Processing import file: {file_path}")
+    # Файл окремого магазину (store_<номер>...) — у його залишки, а не в загальний каталог
+    store_id = store_from_filename(os.path.basename(file_path))
+    if store_id is not None:
+        logger.info(f"🏪 Import route: store {store_id} stock ({os.path.basename(file_path)})")
+        await process_store_import(status_msg, file_path, store_id)
+        return
+    logger.info(f"📦 Import route: catalog ({os.path.basename(file_path)})")
+
     last_update_time = 0
     
     async def progress_updater(current, total, stage="inserting"):
@@ -154,6 +200,12 @@ async def process_import(status_msg: types.Message, file_path: str):
         )
         
         await notifier.info(status_msg.bot, f"📥 <b>Імпорт OK</b>\nФайл: {os.path.basename(file_path)}\nКількість: {count}")
+
+        # Звіти аналітики для нових даних — один раз, у фоні
+        report_service.schedule_build()
+
+        # Магазинам, чиї кошики урізано під нові залишки, — одне повідомлення кожному
+        notifier.queue_batch(status_msg.bot, build_cart_adjustment_messages(importer.cart_adjustments))
         
         # Видаляємо файл тільки якщо він був у temp (завантажений). 
         # Якщо він був локальний (data/imports), можна залишити або архівувати.
@@ -3,8 +3,12 @@ from aiogram.fsm.context import FSMContext
 from aiogram.filters import Command
 
 from src.config import config
-from src.database.db import db
 from src.keyboards.admin_kb import get_admin_dashboard_keyboard
+from src.services.cleaner import cart_cleaner
+from src.services.notifier import notifier
+from src.services.prefetcher import prefetcher
+from src.services.screen_cache import screen_cache
+from src.services.summary import summary
 
 router = Router()
 
@@ -28,14 +32,25 @@ async def admin_back_main(callback: types.CallbackQuery, state: FSMContext):
 
 async def show_admin_dashboard(message: types.Message, is_edit: bool = False):
     """Показує головну статистику та меню"""
-    # Отримуємо свіжу статистику
-    users_count = await db.fetch_one("SELECT COUNT(*) as cnt FROM users")
-    products_count = await db.fetch_one("SELECT COUNT(*) as cnt FROM products")
+    # Лічильники зі зведеної таблиці (оновлюються імпортом і тригером), без COUNT(*)
+    totals = await summary.totals()
+    screens = screen_cache.stats()
+    prefetch = prefetcher.stats()
+    cleanup = cart_cleaner.stats()
+    notifications = notifier.stats()
     
     text = (
         f"⚙️ <b>Панель Адміністратора</b>\n\n"
-        f"👥 Користувачів: <b>{users_count['cnt']}</b>\n"
-        f"📦 Товарів у базі: <b>{products_count['cnt']}</b>\n\n"
+        f"👥 Користувачів: <b>{totals['users']:.0f}</b>\n"
+        f"📦 Товарів у базі: <b>{totals['products']:.0f}</b> (залишок на {totals['stock_value']:,.0f} грн)\n"
+        f"🧠 Кеш каталогу: <b>{screens['hit_rate']:.0%}</b> влучань "
+        f"({screens['hits']}/{screens['hits'] + screens['misses']}, екранів: {screens['size']})\n"
+        f"🔮 Prefetch: влучань <b>{prefetch['hits']}</b>, промахів {prefetch['misses']}, "
+        f"марних {prefetch['wasted']} (прогріто {prefetch['rendered']})\n"
+        f"🧹 Покинуті кошики: видалено <b>{cleanup['removed_rows']}</b> рядків "
+        f"(останній прохід: {cleanup['last_removed']})\n"
+        f"📨 Сповіщення: у черзі <b>{notifications['pending']}</b>, відправлено {notifications['sent']} "
+        f"(з {notifications['queued']}), відкинуто {notifications['dropped']}\n\n"
         "Оберіть дію або <b>надішліть файл</b> (.xlsx) для швидкого імпорту."
     )
     
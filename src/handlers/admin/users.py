@@ -1,9 +1,15 @@
 from aiogram import Router, F, types
 from aiogram.exceptions import TelegramBadRequest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
 
 from src.database.db import db
 from src.keyboards.admin_kb import get_users_list_keyboard, get_user_role_keyboard
 from src.services.notifier import notifier
+from src.services.user_cache import user_cache
+
+class UserStates(StatesGroup):
+    waiting_for_store_id = State()
 
 router = Router()
 
@@ -52,8 +58,9 @@ async def render_users_page(callback: types.CallbackQuery, page: int):
 # --- РЕДАГУВАННЯ КОРИСТУВАЧА ---
 
 @router.callback_query(F.data.startswith("user_edit_"))
-async def edit_user_menu(callback: types.CallbackQuery):
+async def edit_user_menu(callback: types.CallbackQuery, state: FSMContext):
     """Меню редагування конкретного юзера"""
+    await state.clear()
     user_id = int(callback.data.split("_")[2])
     
     user = await db.fetch_one("SELECT * FROM users WHERE user_id = $1", user_id)
@@ -66,7 +73,8 @@ async def edit_user_menu(callback: types.CallbackQuery):
         f"ID: <code>{user['user_id']}</code>\n"
         f"Name: {user['full_name']}\n"
         f"Username: @{user['username']}\n"
-        f"Role: <b>{user['role']}</b>\n\n"
+        f"Role: <b>{user['role']}</b>\n"
+        f"Магазин: <b>{'№' + str(user['store_id']) if user['store_id'] else 'загальний залишок'}</b>\n\n"
         "Оберіть нову роль:"
     )
     
@@ -85,6 +93,7 @@ async def set_user_role(callback: types.CallbackQuery):
     
     # Оновлюємо в БД
     await db.execute("UPDATE users SET role = $1 WHERE user_id = $2", new_role, user_id)
+    await user_cache.invalidate(user_id)
     
     # Логуємо дію
     admin_name = callback.from_user.full_name
@@ -99,4 +108,42 @@ async def set_user_role(callback: types.CallbackQuery):
     await callback.answer(f"✅ Роль змінено на {new_role}!", show_alert=True)
     
     # Повертаємось до списку користувачів
-    await render_users_page(callback, page=0)
\ No newline at end of file
+    await render_users_page(callback, page=0)
+
+@router.callback_query(F.data.startswith("user_store_"))
+async def ask_user_store(callback: types.CallbackQuery, state: FSMContext):
+    """Запит номера магазину для користувача"""
+    user_id = int(callback.data.split("_")[2])
+    await state.set_state(UserStates.waiting_for_store_id)
+    await state.update_data(store_user_id=user_id)
+    await callback.message.edit_text(
+        f"🏪 Введіть номер магазину для користувача <code>{user_id}</code>\n"
+        "<i>(0 — працювати із загальним залишком)</i>",
+        parse_mode="HTML",
+        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[
+            [types.InlineKeyboardButton(text="🔙 Скасувати", callback_data=f"user_edit_{user_id}")]
+        ])
+    )
+
+@router.message(UserStates.waiting_for_store_id, F.text)
+async def set_user_store(message: types.Message, state: FSMContext):
+    """Збереження магазину: кошик і аналітика користувача рахуються по залишках цього магазину"""
+    text = message.text.strip()
+    if not text.isdigit():
+        await message.answer("🔢 Введіть номер магазину (ціле число)!")
+        return
+
+    user_id = (await state.get_data())['store_user_id']
+    store_id = int(text) or None
+    await db.execute("UPDATE users SET store_id = $1 WHERE user_id = $2", store_id, user_id)
+    await user_cache.invalidate(user_id)
+    await state.clear()
+
+    await notifier.info(
+        message.bot,
+        f"🏪 <b>Зміна магазину</b>\n"
+        f"Адмін: {message.from_user.full_name}\n"
+        f"Користувач ID: {user_id}\n"
+        f"Магазин: <b>{store_id or 'загальний'}</b>"
+    )
+    await message.answer(f"✅ Магазин користувача {user_id}: <b>{store_id or 'загальний залишок'}</b>", parse_mode="HTML")
\ No newline at end of file
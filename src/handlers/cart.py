@@ -1,28 +1,43 @@
-from aiogram import Router, F, types
+import asyncio
+import io
+
+import pandas as pd
+from aiogram import Router, F, html, types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from loguru import logger
 
 from src.config import config
 from src.database.db import db
-from src.services.exporter import exporter
-from src.services.notifier import notifier
+from src.services.cart_store import cart_store
+from src.services.history import history
+from src.services.orders import order_service
+from src.utils.text_parsers import parse_order_lines
 from src.keyboards.cart_kb import (
     get_cart_keyboard, 
     get_success_add_keyboard, 
     get_cart_actions_keyboard,
+    get_empty_cart_keyboard,
     get_order_type_keyboard
 )
 
 cart_router = Router()
 
+# Ліміт для кошика магазину: залишок (магазину — з store_stock, інакше загальний) мінус незгораний резерв.
+# Підставляються номери параметрів запиту з магазином і резервом; s — LEFT JOIN store_stock
+STOCK_LIMIT_SQL = (
+    "GREATEST(floor(CASE WHEN {store}::int IS NULL THEN p.stock_qty "
+    "ELSE coalesce(s.stock_qty, 0) END)::int - {reserve}, 0)"
+)
+
 class OrderStates(StatesGroup):
     waiting_for_quantity = State()
+    waiting_for_bulk_list = State()
 
 # --- ДОДАВАННЯ В КОШИК ---
 
 @cart_router.callback_query(F.data.startswith("add_"))
-async def start_add_to_cart(callback: types.CallbackQuery, state: FSMContext):
+async def start_add_to_cart(callback: types.CallbackQuery, state: FSMContext, db_user: dict):
     """
     Показує розширену картку товару і запитує кількість.
     Підтримує швидкі кнопки додавання.
@@ -36,17 +51,21 @@ async def start_add_to_cart(callback: types.CallbackQuery, state: FSMContext):
         back_cb = "_".join(parts[2:])
 
     # [ЗМІНА 1] Отримуємо більше даних для красивої картки
+    # Для прив'язаного до магазину користувача — наявність у його магазині
     prod = await db.fetch_one("""
-        SELECT name, stock_qty, stock_sum, supplier, department, cluster 
-        FROM products WHERE article = $1
-    """, article)
+        SELECT p.name, CASE WHEN $2::int IS NULL THEN p.stock_qty ELSE coalesce(s.stock_qty, 0) END AS stock_qty,
+               p.unit_price, p.supplier, p.department, p.cluster
+        FROM products p
+        LEFT JOIN store_stock s ON s.store_id = $2 AND s.article = p.article
+        WHERE p.article = $1
+    """, article, db_user.get('store_id'))
     
     if not prod:
         await callback.answer("Товар не знайдено!", show_alert=True)
         return
 
-    # [ЗМІНА 2] Розрахунок ціни
-    price = prod['stock_sum'] / prod['stock_qty'] if prod['stock_qty'] > 0 else 0.0
+    price = prod['unit_price']
+    trend = (await history.velocity([article])).get(article)
     
     # Зберігаємо контекст
     await state.update_data(article=article, back_cb=back_cb, max_qty=int(prod['stock_qty']))
@@ -59,7 +78,9 @@ async def start_add_to_cart(callback: types.CallbackQuery, state: FSMContext):
         f"🏭 Постачальник: <i>{prod['supplier'] or 'Не вказано'}</i>\n"
         f"🗂 Група: {prod['cluster'] or '-'}\n\n"
         f"📊 Наявність: <b>{prod['stock_qty']} шт.</b>\n"
-        f"💰 Ціна: <b>{price:.2f} грн</b>\n\n"
+        f"💰 Ціна: <b>{price:.2f} грн</b>\n"
+        + (f"📈 Продажі: ~{trend['per_week']:.1f} шт./тиж. (за {config.HISTORY_VELOCITY_WEEKS} тиж.)\n" if trend else "")
+        + "\n"
         "👇 <b>Введіть кількість або оберіть варіант:</b>"
     )
     
@@ -78,7 +99,7 @@ async def cancel_add(callback: types.CallbackQuery, state: FSMContext):
 
 # [ЗМІНА 4] Новий хендлер для кнопок +1, +5
 @cart_router.callback_query(F.data.startswith("qty_"))
-async def quick_quantity_input(callback: types.CallbackQuery, state: FSMContext):
+async def quick_quantity_input(callback: types.CallbackQuery, state: FSMContext, db_user: dict):
     """Обробляє натискання кнопок з цифрами"""
     qty_str = callback.data.split("_")[1] # qty_5 -> 5
     
@@ -93,11 +114,11 @@ async def quick_quantity_input(callback: types.CallbackQuery, state: FSMContext)
     )
     
     # Викликаємо головну функцію з прапором from_button=True
-    await process_quantity(message, state, from_button=True, original_msg=callback.message)
+    await process_quantity(message, state, db_user, from_button=True, original_msg=callback.message)
 
 @cart_router.message(OrderStates.waiting_for_quantity)
-async def process_quantity(message: types.Message, state: FSMContext, from_button=False, original_msg=None):
-    """Обробка кількості (Транзакція)"""
+async def process_quantity(message: types.Message, state: FSMContext, db_user: dict, from_button=False, original_msg=None):
+    """Обробка кількості"""
     text = message.text.strip()
     
     if not text.isdigit():
@@ -115,54 +136,53 @@ async def process_quantity(message: types.Message, state: FSMContext, from_butto
     article = data.get('article')
     back_cb = data.get('back_cb')
     user_id = message.from_user.id
+    role = db_user['role']
+    store_id = db_user.get('store_id')
 
-    user = await db.fetch_one("SELECT role FROM users WHERE user_id = $1", user_id)
-    role = user['role'] if user else 'shop'
+    try:
+        # Залишок (магазину користувача, якщо він прив'язаний) мінус незгораний резерв;
+        # чужі кошики віднімає реєстр резервів у Redis
+        product = await db.fetch_one(f"""
+            SELECT p.name, {STOCK_LIMIT_SQL.format(store='$3', reserve='$2')} AS stock_limit
+            FROM products p
+            LEFT JOIN store_stock s ON s.store_id = $3 AND s.article = p.article
+            WHERE p.article = $1
+        """, article, config.STOCK_RESERVE, store_id)
+
+        added, max_qty = False, 0
+        if product:
+            # Перевірка ліміту (MAX_ORDER_QTY, для магазинів — ще й вільний залишок) та запис —
+            # атомарно в одному Lua-скрипті
+            stock = product['stock_limit'] if role == 'shop' else None
+            added, max_qty = await cart_store.set_quantity(
+                user_id, article, qty, config.MAX_ORDER_QTY, stock, store_id=store_id
+            )
+    except Exception as e:
+        logger.error(f"Cart Error: {e}")
+        if not from_button:
+            await message.answer("❌ Помилка кошика.")
+        await state.clear()
+        return
 
-    # --- ТРАНЗАКЦІЯ ---
+    # --- Уся взаємодія з Telegram — після запису ---
     try:
-        async with db.pool.acquire() as connection:
-            async with connection.transaction():
-                product = await connection.fetchrow(
-                    "SELECT name, stock_qty FROM products WHERE article = $1 FOR UPDATE", 
-                    article
+        if not product:
+            await message.answer("❌ Товар зник.")
+            await state.clear()
+            return
+
+        if not added:
+            msg = f"⛔️ Доступно: <b>{max_qty}</b> шт."
+            # [ЗМІНА 5] Якщо це кнопка - редагуємо старе повідомлення, щоб не смітити
+            if from_button:
+                await original_msg.edit_text(
+                    original_msg.html_text + f"\n\n{msg}", 
+                    parse_mode="HTML", 
+                    reply_markup=get_cart_keyboard(article)
                 )
-                
-                if not product:
-                    await message.answer("❌ Товар зник.")
-                    await state.clear()
-                    return
-
-                # Перевірка лімітів
-                max_qty = 999999
-                if role == 'shop':
-                    reserve = config.STOCK_RESERVE
-                    available = int(product['stock_qty']) - reserve
-                    if available < 0: available = 0
-                    max_qty = available
-                
-                max_qty = min(max_qty, config.MAX_ORDER_QTY)
-
-                if qty > max_qty:
-                    msg = f"⛔️ Доступно: <b>{max_qty}</b> шт."
-                    # [ЗМІНА 5] Якщо це кнопка - редагуємо старе повідомлення, щоб не смітити
-                    if from_button:
-                        await original_msg.edit_text(
-                            original_msg.html_text + f"\n\n{msg}", 
-                            parse_mode="HTML", 
-                            reply_markup=get_cart_keyboard(article)
-                        )
-                    else:
-                        await message.answer(msg, parse_mode="HTML")
-                    return
-
-                # Запис
-                await connection.execute("""
-                    INSERT INTO cart (user_id, article, quantity)
-                    VALUES ($1, $2, $3)
-                    ON CONFLICT (user_id, article) 
-                    DO UPDATE SET quantity = $3, updated_at = CURRENT_TIMESTAMP
-                """, user_id, article, qty)
+            else:
+                await message.answer(msg, parse_mode="HTML")
+            return
 
         logger.info(f"🛒 Cart: {user_id} added {qty} of {article}")
         
@@ -181,57 +201,189 @@ async def process_quantity(message: types.Message, state: FSMContext, from_butto
             await message.answer("❌ Помилка кошика.")
         await state.clear()
 
-# --- ПЕРЕГЛЯД КОШИКА (Без змін логіки, тільки перевірка) ---
+# --- ПЕРЕГЛЯД КОШИКА ---
+
+async def fetch_cart_page(lines_qty: dict[str, int], page: int) -> list:
+    """
+    Одна сторінка кошика + підсумки всього кошика (віконні функції рахуються до LIMIT),
+    тож з БД приходять лише рядки сторінки.
+    """
+    return await db.fetch_all("""
+        SELECT p.article, p.name, t.quantity, p.unit_price,
+               p.unit_price * t.quantity AS line_sum,
+               count(*) OVER () AS total_lines,
+               sum(p.unit_price * t.quantity) OVER () AS total_sum
+        FROM unnest($1::text[], $2::int[]) AS t(article, quantity)
+        JOIN products p ON p.article = t.article
+        ORDER BY p.name, p.article
+        LIMIT $3 OFFSET $4
+    """, list(lines_qty), list(lines_qty.values()), config.CART_PAGE_SIZE, page * config.CART_PAGE_SIZE)
 
 @cart_router.message(F.text == "🛒 Кошик")
 @cart_router.callback_query(F.data == "view_cart_btn")
+@cart_router.callback_query(F.data.startswith("cart_page_"))
 async def show_cart(event: types.Message | types.CallbackQuery):
     message = event.message if isinstance(event, types.CallbackQuery) else event
     user_id = event.from_user.id
 
-    items = await db.fetch_all("""
-        SELECT c.article, c.quantity, p.name, p.stock_sum, p.stock_qty
-        FROM cart c
-        JOIN products p ON c.article = p.article
-        WHERE c.user_id = $1
-        ORDER BY p.name
-    """, user_id)
+    page = 0
+    if isinstance(event, types.CallbackQuery) and event.data.startswith("cart_page_"):
+        page = int(event.data.split("_")[2])
+
+    lines_qty = await cart_store.items(user_id)
+    rows = await fetch_cart_page(lines_qty, page) if lines_qty else []
+    if not rows and page > 0:
+        # Кошик зменшився, поки користувач гортав — повертаємось на першу сторінку
+        page = 0
+        rows = await fetch_cart_page(lines_qty, page)
 
-    if not items:
+    if not rows:
         text = "🛒 Ваша корзина порожня."
         if isinstance(event, types.CallbackQuery):
-            await message.edit_text(text)
+            await message.edit_text(text, reply_markup=get_empty_cart_keyboard())
         else:
-            await message.answer(text)
+            await message.answer(text, reply_markup=get_empty_cart_keyboard())
         return
 
-    lines = []
-    total_sum = 0
-    for item in items:
-        price = item['stock_sum'] / item['stock_qty'] if item['stock_qty'] > 0 else 0
-        sum_line = price * item['quantity']
-        total_sum += sum_line
-        lines.append(f"▫️ <b>{item['name']}</b>\n   {item['quantity']} шт. x {price:.2f} = {sum_line:.2f} грн")
+    total_lines = rows[0]['total_lines']
+    total_pages = (total_lines + config.CART_PAGE_SIZE - 1) // config.CART_PAGE_SIZE
+    lines = [
+        f"▫️ <b>{html.quote(item['name'] or item['article'])}</b>\n"
+        f"   {item['quantity']} шт. x {item['unit_price']:.2f} = {item['line_sum']:.2f} грн"
+        for item in rows
+    ]
+
+    text = f"🛒 <b>Ваше замовлення</b> ({total_lines} поз.):\n\n" + "\n".join(lines) + f"\n\n💰 Разом: <b>{rows[0]['total_sum']:.2f} грн</b>"
+    markup = get_cart_actions_keyboard(page, total_pages)
 
-    text = f"🛒 <b>Ваше замовлення:</b>\n\n" + "\n".join(lines) + f"\n\n💰 Разом: <b>{total_sum:.2f} грн</b>"
-    
     if isinstance(event, types.CallbackQuery):
-        await message.edit_text(text, parse_mode="HTML", reply_markup=get_cart_actions_keyboard())
+        await message.edit_text(text, parse_mode="HTML", reply_markup=markup)
     else:
-        await message.answer(text, parse_mode="HTML", reply_markup=get_cart_actions_keyboard())
+        await message.answer(text, parse_mode="HTML", reply_markup=markup)
+
+# --- МАСОВЕ ДОДАВАННЯ: СПИСОК "АРТИКУЛ КІЛЬКІСТЬ" ---
+
+@cart_router.callback_query(F.data == "bulk_cart")
+async def start_bulk_add(callback: types.CallbackQuery, state: FSMContext):
+    await state.set_state(OrderStates.waiting_for_bulk_list)
+    await callback.message.answer(
+        "📋 <b>Додавання списком</b>\n\n"
+        "Надішліть повідомлення, де кожен рядок — <code>артикул кількість</code>, "
+        "або файл <code>.csv</code>/<code>.xlsx</code> (перші дві колонки).\n"
+        f"<i>Максимум {config.BULK_MAX_LINES} рядків.</i>",
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+@cart_router.message(OrderStates.waiting_for_bulk_list, F.document)
+async def process_bulk_file(message: types.Message, state: FSMContext, db_user: dict):
+    doc = message.document
+    name = (doc.file_name or "").lower()
+    if not name.endswith(('.csv', '.xlsx')) or doc.file_size > 1024 * 1024:
+        await message.answer("❌ Потрібен файл .csv або .xlsx до 1 МБ.")
+        return
+
+    buffer = await message.bot.download(doc, destination=io.BytesIO())
+
+    def read_lines():
+        buffer.seek(0)
+        if name.endswith('.csv'):
+            df = pd.read_csv(buffer, header=None, dtype=str, sep=None, engine='python')
+        else:
+            df = pd.read_excel(buffer, header=None, dtype=str, engine='openpyxl')
+        df = df.iloc[:, :2].dropna()
+        return [f"{a} {q}" for a, q in zip(df.iloc[:, 0], df.iloc[:, 1])]
+
+    try:
+        lines = await asyncio.to_thread(read_lines)
+    except Exception as e:
+        logger.error(f"Bulk file read failed: {e}")
+        await message.answer("❌ Не вдалося прочитати файл.")
+        return
+
+    await add_bulk_lines(message, state, db_user, lines)
+
+@cart_router.message(OrderStates.waiting_for_bulk_list, F.text)
+async def process_bulk_text(message: types.Message, state: FSMContext, db_user: dict):
+    await add_bulk_lines(message, state, db_user, message.text.splitlines())
+
+async def add_bulk_lines(message: types.Message, state: FSMContext, db_user: dict, lines: list[str]):
+    """Перевіряє всі рядки одним запитом до БД і записує прийняті одним Lua-викликом"""
+    pairs, bad_lines, too_large = parse_order_lines(lines, config.MAX_ORDER_QTY)
+    # Рядок-заголовок файлу ("Артикул Кількість") не рахуємо помилкою
+    if bad_lines and "артикул" in bad_lines[0].lower():
+        bad_lines = bad_lines[1:]
+
+    if len(pairs) > config.BULK_MAX_LINES:
+        await message.answer(f"❌ Забагато рядків: {len(pairs)} (максимум {config.BULK_MAX_LINES}).")
+        return
+    if not pairs and not too_large:
+        await message.answer("⚠️ Не знайдено жодного рядка <code>артикул кількість</code>.", parse_mode="HTML")
+        return
+
+    rejected = [f"{line} — не розпізнано" for line in bad_lines]
+    rejected += [f"{line} — більше за максимум {config.MAX_ORDER_QTY} шт." for line in too_large]
+
+    user_id = message.from_user.id
+    is_shop = db_user['role'] == 'shop'
+    store_id = db_user.get('store_id')
+    try:
+        rows = await db.fetch_all(f"""
+            SELECT t.article, t.qty, p.name, {STOCK_LIMIT_SQL.format(store='$4', reserve='$3')} AS stock_limit
+            FROM unnest($1::text[], $2::int[]) AS t(article, qty)
+            LEFT JOIN products p ON p.article = t.article
+            LEFT JOIN store_stock s ON s.store_id = $4 AND s.article = t.article
+        """, list(pairs), list(pairs.values()), config.STOCK_RESERVE, store_id)
+
+        candidates = []
+        for r in rows:
+            if r['name'] is None:
+                rejected.append(f"{r['article']} — товар не знайдено")
+            elif r['qty'] <= 0:
+                rejected.append(f"{r['article']} — кількість має бути > 0")
+            else:
+                candidates.append(r)
+
+        # Ліміти (з урахуванням резервів інших магазинів) перевіряє Lua-скрипт разом із записом
+        results = await cart_store.set_many(
+            user_id,
+            [(r['article'], r['qty'], config.MAX_ORDER_QTY, r['stock_limit'] if is_shop else None) for r in candidates],
+            reserving=is_shop, store_id=store_id
+        )
+    except Exception as e:
+        logger.error(f"Cart Error: {e}")
+        await message.answer("❌ Помилка кошика.")
+        await state.clear()
+        return
+
+    accepted = []
+    for r, (ok, value) in zip(candidates, results):
+        if ok:
+            accepted.append(r)
+        else:
+            rejected.append(f"{r['article']} — доступно лише {value} шт.")
+    logger.info(f"🛒 Cart bulk: {user_id} added {len(accepted)} lines, rejected {len(rejected)}")
+
+    text = f"📋 <b>Додано в кошик:</b> {len(accepted)} поз. ({sum(r['qty'] for r in accepted)} шт.)"
+    if rejected:
+        shown = "\n".join(f"▫️ {html.quote(line)}" for line in rejected[:30])
+        more = f"\n… і ще {len(rejected) - 30}" if len(rejected) > 30 else ""
+        text += f"\n\n❌ <b>Відхилено:</b> {len(rejected)}\n{shown}{more}"
+
+    await message.answer(text, parse_mode="HTML", reply_markup=get_success_add_keyboard())
+    await state.clear()
 
 # --- КЕРУВАННЯ КОШИКОМ ---
 
 @cart_router.callback_query(F.data == "clear_cart")
 async def clear_cart(callback: types.CallbackQuery):
-    await db.execute("DELETE FROM cart WHERE user_id = $1", callback.from_user.id)
+    await cart_store.clear(callback.from_user.id)
     await callback.answer("Кошик очищено")
     await callback.message.edit_text("🛒 Кошик порожній.")
 
 @cart_router.callback_query(F.data == "submit_order")
-async def pre_submit_order(callback: types.CallbackQuery):
-    user = await db.fetch_one("SELECT role FROM users WHERE user_id = $1", callback.from_user.id)
-    role = user['role']
+async def pre_submit_order(callback: types.CallbackQuery, db_user: dict):
+    role = db_user['role']
     
     if role == 'shop':
         await finalize_order(callback, role, 'department')
@@ -247,41 +399,31 @@ async def admin_select_order_type(callback: types.CallbackQuery):
     await finalize_order(callback, 'admin', mode)
 
 async def finalize_order(callback: types.CallbackQuery, role: str, grouping_mode: str):
-    await callback.message.edit_text("⏳ Формую замовлення...")
+    """Записує замовлення і одразу відповідає; файли сформує та надішле order_service у фоні"""
     user_id = callback.from_user.id
-    items = await db.fetch_all("""
-        SELECT c.article, c.quantity, p.name, p.department, p.supplier
-        FROM cart c
-        JOIN products p ON c.article = p.article
-        WHERE c.user_id = $1
-    """, user_id)
-    
-    if not items:
+    # Рядки забираються з кошика атомарно: подвійне натискання не створить двох замовлень,
+    # а все, що додасться після цього, лишиться в кошику
+    snapshot = await cart_store.claim(user_id)
+    if not snapshot:
         await callback.message.edit_text("❌ Помилка: кошик порожній.")
         return
 
     try:
-        files = await exporter.generate_order_files(items, grouping_mode, user_id)
-        await callback.message.delete()
-        
-        for file_path in files:
-            await callback.message.answer_document(
-                types.FSInputFile(file_path),
-                caption=f"✅ Замовлення сформовано ({grouping_mode})"
-            )
-            
-        user_info = f"{callback.from_user.full_name} (@{callback.from_user.username})"
-        await notifier.info(
-            callback.bot, 
-            f"🛍 <b>Нове замовлення!</b>\n"
-            f"Користувач: {user_info}\n"
-            f"Позицій: {len(items)}\n"
-            f"Режим: {grouping_mode}"
-        )
+        created = await order_service.create(user_id, callback.message.chat.id, grouping_mode, snapshot)
+    except Exception as e:
+        logger.error(f"Order create failed for {user_id}: {e}")
+        await cart_store.restore(user_id, snapshot)
+        await callback.message.edit_text("❌ Не вдалося оформити замовлення, кошик збережено. Спробуйте ще раз.")
+        return
 
-        await db.execute("DELETE FROM cart WHERE user_id = $1", user_id)
-        await callback.message.answer("🎉 Дякуємо! Замовлення відправлено.", reply_markup=get_cart_keyboard(''))
+    if not created:
+        # Жодного товару вже немає в каталозі — рядки повертаємо, як і раніше лишались у кошику
+        await cart_store.restore(user_id, snapshot)
+        await callback.message.edit_text("❌ Помилка: кошик порожній.")
+        return
 
-    except Exception as e:
-        logger.error(f"Order failed: {e}")
-        await callback.message.answer(f"❌ Помилка при формуванні замовлення: {e}")
\ No newline at end of file
+    order_id, lines = created
+    await callback.message.edit_text(
+        f"⏳ Замовлення №{order_id} прийнято ({lines} поз.).\n"
+        "Файли надійдуть сюди за кілька секунд."
+    )
@@ -1,34 +1,18 @@
 from aiogram import F, Router, types
 from aiogram.filters import CommandStart
 
-from src.config import config  # <--- Не забудь імпортувати конфіг
-from src.database.db import db
 from src.keyboards.main_menu import get_main_menu
 
 common_router = Router()
 
 @common_router.message(CommandStart())
-async def cmd_start(message: types.Message):
+async def cmd_start(message: types.Message, db_user: dict):
     user = message.from_user
     
-    # 1. Спочатку записуємо/оновлюємо користувача як зазвичай
-    await db.execute("""
-        INSERT INTO users (user_id, username, full_name)
-        VALUES ($1, $2, $3)
-        ON CONFLICT (user_id) DO UPDATE 
-        SET full_name = $3, username = $2
-    """, user.id, user.username, user.full_name)
+    # Реєстрація, примусова роль 'admin' для ADMIN_IDS та кеш ролі — в UserMiddleware
+    role = db_user['role']
 
-    # 2. !!! МАГІЯ ТУТ !!! 
-    # Якщо ID юзера є в списку адмінів у конфігу -> примусово ставимо роль 'admin'
-    if user.id in config.ADMIN_IDS:
-        await db.execute("UPDATE users SET role = 'admin' WHERE user_id = $1", user.id)
-
-    # 3. Тепер читаємо роль із бази (вона вже буде правильною)
-    row = await db.fetch_one("SELECT role FROM users WHERE user_id = $1", user.id)
-    role = row['role']
-
-    # 4. Відповідь
+    # Відповідь
     text = f"Вітаю, {user.full_name}! 👋\n"
     text += f"Ваша роль: <b>{role.upper()}</b>\n\n"
     
@@ -39,7 +23,7 @@ async def cmd_start(message: types.Message):
     elif role == 'admin':
         text += "⚙️ Вам доступно все + панель керування."
 
-    # 5. Показуємо меню
+    # Показуємо меню
     await message.answer(
         text, 
         parse_mode="HTML",
@@ -48,5 +32,5 @@ async def cmd_start(message: types.Message):
 
 # Обробка кнопки "Мій профіль"
 @common_router.message(F.text == "👤 Мій профіль")
-async def profile_handler(message: types.Message):
-    await cmd_start(message)
\ No newline at end of file
+async def profile_handler(message: types.Message, db_user: dict):
+    await cmd_start(message, db_user)
\ No newline at end of file
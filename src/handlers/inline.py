@@ -0,0 +1,39 @@
+from aiogram import Router, html, types
+
+from src.config import config
+from src.services.search import search_service
+
+inline_router = Router()
+
+# --- INLINE-ПОШУК: @bot молоко (працює в будь-якому чаті) ---
+# Потребує увімкненого Inline Mode у @BotFather (/setinline)
+
+@inline_router.inline_query()
+async def inline_search(inline_query: types.InlineQuery):
+    query = inline_query.query.strip()
+    if len(query) < 2:
+        await inline_query.answer([], cache_time=config.INLINE_CACHE_TIME, is_personal=False)
+        return
+
+    products = await search_service.search(query, limit=50)
+
+    results = []
+    for product in products:
+        price = product['unit_price']
+        results.append(types.InlineQueryResultArticle(
+            id=str(product['article']),
+            title=product['name'] or str(product['article']),
+            description=f"Арт. {product['article']} | {price:.2f} грн | Залишок: {product['stock_qty']:g} шт.",
+            input_message_content=types.InputTextMessageContent(
+                message_text=(
+                    f"🛍 <b>{html.quote(product['name'] or '')}</b>\n"
+                    f"🆔 Артикул: <code>{html.quote(str(product['article']))}</code>\n"
+                    f"💰 Ціна: <b>{price:.2f} грн</b>\n"
+                    f"📊 Наявність: <b>{product['stock_qty']:g} шт.</b>"
+                ),
+                parse_mode="HTML"
+            )
+        ))
+
+    # Результати однакові для всіх — дозволяємо Telegram кешувати їх спільно
+    await inline_query.answer(results, cache_time=config.INLINE_CACHE_TIME, is_personal=False)
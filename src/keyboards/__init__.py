@@ -8,6 +8,7 @@ from .cart_kb import (
     get_cart_keyboard,
     get_success_add_keyboard,
     get_cart_actions_keyboard,
+    get_empty_cart_keyboard,
     get_order_type_keyboard,
     get_analytics_order_type_keyboard
 )
@@ -27,6 +28,7 @@ __all__ = [
     "get_cart_keyboard",
     "get_success_add_keyboard",
     "get_cart_actions_keyboard",
+    "get_empty_cart_keyboard",
     "get_order_type_keyboard",
     "get_analytics_order_type_keyboard",
     "get_departments_keyboard",
@@ -64,6 +64,7 @@ def get_user_role_keyboard(user_id: int, current_role: str) -> InlineKeyboardMar
         else:
             text = role_name
         builder.button(text=text, callback_data=f"set_role_{user_id}_{role_code}")
+    builder.button(text="🏪 Прив'язати до магазину", callback_data=f"user_store_{user_id}")
     
     builder.adjust(1)
     builder.row(InlineKeyboardButton(text="🔙 Назад до списку", callback_data="admin_users"))
@@ -34,14 +34,29 @@ def get_success_add_keyboard(back_callback: Optional[str] = None) -> InlineKeybo
     builder.adjust(1)
     return builder.as_markup()
 
-def get_cart_actions_keyboard() -> InlineKeyboardMarkup:
-    """Дії в кошику"""
+def get_cart_actions_keyboard(page: int = 0, total_pages: int = 1) -> InlineKeyboardMarkup:
+    """Дії в кошику (+ гортання сторінок, якщо кошик довгий)"""
     builder = InlineKeyboardBuilder()
+    if total_pages > 1:
+        nav_row = []
+        if page > 0:
+            nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"cart_page_{page-1}"))
+        nav_row.append(InlineKeyboardButton(text=f"{page+1}/{total_pages}", callback_data="ignore"))
+        if page < total_pages - 1:
+            nav_row.append(InlineKeyboardButton(text="➡️", callback_data=f"cart_page_{page+1}"))
+        builder.row(*nav_row)
     builder.row(InlineKeyboardButton(text="✅ Відправити замовлення", callback_data="submit_order"))
+    builder.row(InlineKeyboardButton(text="📋 Додати списком", callback_data="bulk_cart"))
     builder.row(InlineKeyboardButton(text="🗑 Очистити кошик", callback_data="clear_cart"))
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data="start_menu"))
     return builder.as_markup()
 
+def get_empty_cart_keyboard() -> InlineKeyboardMarkup:
+    """Порожній кошик: можна одразу вставити список"""
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="📋 Додати списком", callback_data="bulk_cart"))
+    return builder.as_markup()
+
 def get_order_type_keyboard() -> InlineKeyboardMarkup:
     """Вибір типу групування"""
     builder = InlineKeyboardBuilder()
@@ -32,12 +32,12 @@ def get_categories_keyboard(categories_data: list, back_callback: str) -> Inline
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=back_callback))
     return builder.as_markup()
 
-def get_products_keyboard(products: list, page: int, total_pages: int, back_callback: str) -> InlineKeyboardMarkup:
-    """Список товарів"""
+def get_products_keyboard(products: list, page: int, total_pages: int, back_callback: str, page_prefix: str = "page") -> InlineKeyboardMarkup:
+    """Список товарів (кнопки сторінок: <page_prefix>_<номер>)"""
     builder = InlineKeyboardBuilder()
     
     for product in products:
-        price = f"{product['stock_sum']/product['stock_qty']:.2f}" if product['stock_qty'] > 0 else "0.00"
+        price = f"{product['unit_price']:.2f}"
         name = product['name']
         article = product['article']
         
@@ -53,12 +53,12 @@ def get_products_keyboard(products: list, page: int, total_pages: int, back_call
     # Пагінація
     nav_row = []
     if page > 0:
-        nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"page_{page-1}"))
+        nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"{page_prefix}_{page-1}"))
     
     nav_row.append(InlineKeyboardButton(text=f"{page+1}/{total_pages}", callback_data="ignore"))
     
     if page < total_pages - 1:
-        nav_row.append(InlineKeyboardButton(text="➡️", callback_data=f"page_{page+1}"))
+        nav_row.append(InlineKeyboardButton(text="➡️", callback_data=f"{page_prefix}_{page+1}"))
         
     builder.row(*nav_row)
     builder.row(InlineKeyboardButton(text="🔙 Назад", callback_data=back_callback))
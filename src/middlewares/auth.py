@@ -0,0 +1,30 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from src.services.user_cache import user_cache
+
+
+class UserMiddleware(BaseMiddleware):
+    """
+    Outer-middleware: один раз на апдейт визначає користувача (з кешу або UPSERT)
+    і передає його хендлерам як `db_user` (dict: user_id, username, full_name, role, store_id).
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        # Inline-пошук (@bot … у будь-якому чаті) db_user не потрібен — не реєструємо
+        # кожного, хто набрав ім'я бота, як користувача
+        if isinstance(event, Update) and (event.inline_query or event.chosen_inline_result):
+            return await handler(event, data)
+
+        user = data.get("event_from_user")
+        if user and not user.is_bot:
+            data["db_user"] = await user_cache.resolve(user)
+
+        return await handler(event, data)
@@ -0,0 +1,549 @@
+import asyncio
+import time
+
+from loguru import logger
+
+from src.config import config
+from src.database.db import db
+from src.database.redis_cache import redis
+
+# Службові поля хеша кошика починаються з "_":
+# "_"  — кошик завантажено з Postgres (щоб відрізняти порожній кошик від відсутнього в Redis)
+# "_r" — "1", якщо рядки кошика зараз враховані в реєстрі резервів
+# "_s" — магазин користувача (його резерви ведуться окремо: поле реєстру "<store>:<article>")
+DIRTY_KEY = "cart:dirty"
+
+# Реєстр резервів: [store:]article -> скільки штук лежить у кошиках магазинів (оновлюється інкрементально)
+RESERVED_KEY = "cart:reserved"
+# Кошики, що резервують товар: user_id -> час останньої зміни (для зняття застарілих резервів)
+ACTIVE_KEY = "cart:active"
+
+# Спільні функції для скриптів, що змінюють кошик
+LUA_HELPERS = """
+local function is_line(field)
+    return string.sub(field, 1, 1) ~= '_'
+end
+
+-- Префікс полів реєстру для кошика: резерви різних магазинів не перетинаються
+local function ledger_prefix(cart)
+    local store = redis.call('HGET', cart, '_s')
+    if store then
+        return store .. ':'
+    end
+    return ''
+end
+
+-- Вмикає/вимикає врахування всього кошика в реєстрі
+local function set_reserving(cart, ledger, on)
+    local current = redis.call('HGET', cart, '_r') == '1'
+    if current == on then
+        return
+    end
+    local sign = on and 1 or -1
+    local prefix = ledger_prefix(cart)
+    local fields = redis.call('HGETALL', cart)
+    for i = 1, #fields, 2 do
+        if is_line(fields[i]) then
+            redis.call('HINCRBY', ledger, prefix .. fields[i], sign * tonumber(fields[i + 1]))
+        end
+    end
+    redis.call('HSET', cart, '_r', on and '1' or '0')
+end
+
+-- Прив'язує кошик до магазину ('' — без магазину); резерв під старим магазином знімається
+local function set_store(cart, ledger, store)
+    if (redis.call('HGET', cart, '_s') or '') == store then
+        return
+    end
+    set_reserving(cart, ledger, false)
+    if store == '' then
+        redis.call('HDEL', cart, '_s')
+    else
+        redis.call('HSET', cart, '_s', store)
+    end
+end
+
+-- Змінює рядок кошика; для резервуючого кошика — і реєстр на різницю
+local function write_line(cart, ledger, article, qty, own, reserving)
+    if qty > 0 then
+        redis.call('HSET', cart, article, qty)
+    else
+        redis.call('HDEL', cart, article)
+    end
+    if reserving and qty ~= own then
+        local field = ledger_prefix(cart) .. article
+        if redis.call('HINCRBY', ledger, field, qty - own) <= 0 then
+            redis.call('HDEL', ledger, field)
+        end
+    end
+end
+
+-- Доступний максимум: ліміт рядка і (для магазинів) залишок мінус резерви інших кошиків. -1 — без ліміту
+local function line_limit(cart, ledger, article, own, max_qty, stock)
+    local limit = max_qty
+    if stock >= 0 then
+        local others = tonumber(redis.call('HGET', ledger, ledger_prefix(cart) .. article) or '0') - own
+        local free = math.max(stock - others, 0)
+        if limit < 0 or free < limit then
+            limit = free
+        end
+    end
+    return limit
+end
+
+local function touch(cart, dirty, active, uid, ttl, now, reserving)
+    redis.call('HSET', cart, '_', '1')
+    redis.call('EXPIRE', cart, ttl)
+    redis.call('SADD', dirty, uid)
+    if reserving then
+        redis.call('ZADD', active, now, uid)
+    else
+        redis.call('ZREM', active, uid)
+    end
+end
+"""
+
+# Перевірка ліміту (з урахуванням резервів інших магазинів) і запис — одна атомарна операція.
+# KEYS = cart:<uid>, cart:dirty, cart:reserved, cart:active
+# ARGV = article, qty, uid, ttl, max_qty (-1 — без ліміту), stock (-1 — кошик не резервує), now,
+#        store ('' — без магазину)
+# Повертає {1, qty} — записано, {0, доступно} — перевищено ліміт
+SET_ITEM_LUA = LUA_HELPERS + """
+local qty = tonumber(ARGV[2])
+local stock = tonumber(ARGV[6])
+local reserving = stock >= 0
+set_store(KEYS[1], KEYS[3], ARGV[8])
+set_reserving(KEYS[1], KEYS[3], reserving)
+
+local own = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+local limit = line_limit(KEYS[1], KEYS[3], ARGV[1], own, tonumber(ARGV[5]), stock)
+if limit >= 0 and qty > limit then
+    return {0, limit}
+end
+write_line(KEYS[1], KEYS[3], ARGV[1], qty, own, reserving)
+touch(KEYS[1], KEYS[2], KEYS[4], ARGV[3], ARGV[4], ARGV[7], reserving)
+return {1, qty}
+"""
+
+# Пакетний варіант SET_ITEM: ARGV = uid, ttl, now, reserving (1/0), store, article1, qty1, max1, stock1, ...
+# Повертає {ok1, limit1, ok2, limit2, ...}
+SET_ITEMS_LUA = LUA_HELPERS + """
+local reserving = ARGV[4] == '1'
+set_store(KEYS[1], KEYS[3], ARGV[5])
+set_reserving(KEYS[1], KEYS[3], reserving)
+
+local result = {}
+for i = 6, #ARGV, 4 do
+    local article = ARGV[i]
+    local qty = tonumber(ARGV[i + 1])
+    local own = tonumber(redis.call('HGET', KEYS[1], article) or '0')
+    local stock = reserving and tonumber(ARGV[i + 3]) or -1
+    local limit = line_limit(KEYS[1], KEYS[3], article, own, tonumber(ARGV[i + 2]), stock)
+    if qty > 0 and (limit < 0 or qty <= limit) then
+        write_line(KEYS[1], KEYS[3], article, qty, own, reserving)
+        table.insert(result, 1)
+        table.insert(result, qty)
+    else
+        table.insert(result, 0)
+        table.insert(result, limit)
+    end
+end
+touch(KEYS[1], KEYS[2], KEYS[4], ARGV[1], ARGV[2], ARGV[3], reserving)
+return result
+"""
+
+# Завантаження з Postgres лише якщо кошика ще немає в Redis. ARGV = ttl, article1, qty1, ...
+# Завантажений кошик не резервує, доки його не змінять
+LOAD_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], '_', '1')
+for i = 2, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# Видаляє рядки знімка, якщо їх не змінили після нього, і знімає їх резерв.
+# KEYS = cart:<uid>, cart:dirty, cart:reserved; ARGV = uid, article1, qty1, ...
+REMOVE_LINES_LUA = LUA_HELPERS + """
+local reserving = redis.call('HGET', KEYS[1], '_r') == '1'
+for i = 2, #ARGV, 2 do
+    if redis.call('HGET', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        write_line(KEYS[1], KEYS[3], ARGV[i], 0, tonumber(ARGV[i + 1]), reserving)
+    end
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+return 1
+"""
+
+# Забирає всі рядки кошика для оформлення (і їх резерв) — повторний виклик отримає порожній кошик.
+# KEYS = cart:<uid>, cart:dirty, cart:reserved; ARGV = uid. Повертає {article1, qty1, ...}
+CLAIM_LUA = LUA_HELPERS + """
+local reserving = redis.call('HGET', KEYS[1], '_r') == '1'
+local fields = redis.call('HGETALL', KEYS[1])
+local claimed = {}
+for i = 1, #fields, 2 do
+    if is_line(fields[i]) then
+        write_line(KEYS[1], KEYS[3], fields[i], 0, tonumber(fields[i + 1]), reserving)
+        table.insert(claimed, fields[i])
+        table.insert(claimed, fields[i + 1])
+    end
+end
+if #claimed > 0 then
+    redis.call('SADD', KEYS[2], ARGV[1])
+end
+return claimed
+"""
+
+# Повертає забрані рядки, якщо замовлення не записалось (додає до того, що є зараз).
+# KEYS = cart:<uid>, cart:dirty, cart:reserved; ARGV = uid, ttl, article1, qty1, ...
+RESTORE_LUA = LUA_HELPERS + """
+local reserving = redis.call('HGET', KEYS[1], '_r') == '1'
+for i = 3, #ARGV, 2 do
+    local own = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0')
+    write_line(KEYS[1], KEYS[3], ARGV[i], own + tonumber(ARGV[i + 1]), own, reserving)
+end
+redis.call('HSET', KEYS[1], '_', '1')
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('SADD', KEYS[2], ARGV[1])
+return 1
+"""
+
+# Застосовує до Redis урізання після імпорту, якщо рядок не змінили після запису в Postgres.
+# KEYS = cart:<uid>, cart:reserved; ARGV = article1, old1, new1, ...
+CLAMP_LUA = LUA_HELPERS + """
+local reserving = redis.call('HGET', KEYS[1], '_r') == '1'
+for i = 1, #ARGV, 3 do
+    local old = tonumber(ARGV[i + 1])
+    if tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '-1') == old then
+        write_line(KEYS[1], KEYS[2], ARGV[i], tonumber(ARGV[i + 2]), old, reserving)
+    end
+end
+return 1
+"""
+
+# Знімає резерв кошика, якщо його не чіпали з cutoff (рядки в кошику лишаються).
+# KEYS = cart:<uid>, cart:reserved, cart:active; ARGV = uid, cutoff
+RELEASE_LUA = LUA_HELPERS + """
+local score = redis.call('ZSCORE', KEYS[3], ARGV[1])
+if score and tonumber(score) > tonumber(ARGV[2]) then
+    return 0
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    set_reserving(KEYS[1], KEYS[2], false)
+end
+redis.call('ZREM', KEYS[3], ARGV[1])
+return 1
+"""
+
+# Прибирає з Redis кошик, видалений з Postgres як покинутий (якщо його щойно не змінили).
+# KEYS = cart:<uid>, cart:dirty, cart:reserved, cart:active; ARGV = uid
+DROP_LUA = LUA_HELPERS + """
+if redis.call('SISMEMBER', KEYS[2], ARGV[1]) == 1 then
+    return 0
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    set_reserving(KEYS[1], KEYS[3], false)
+    redis.call('DEL', KEYS[1])
+end
+redis.call('ZREM', KEYS[4], ARGV[1])
+return 1
+"""
+
+# Повна перебудова реєстру з резервуючих кошиків (атомарно).
+# KEYS = cart:reserved, cart:active; ARGV = префікс ключа кошика
+REBUILD_LUA = LUA_HELPERS + """
+redis.call('DEL', KEYS[1])
+local uids = redis.call('ZRANGE', KEYS[2], 0, -1)
+for _, uid in ipairs(uids) do
+    local cart = ARGV[1] .. uid
+    if redis.call('HGET', cart, '_r') == '1' then
+        local prefix = ledger_prefix(cart)
+        local fields = redis.call('HGETALL', cart)
+        for i = 1, #fields, 2 do
+            if is_line(fields[i]) then
+                redis.call('HINCRBY', KEYS[1], prefix .. fields[i], tonumber(fields[i + 1]))
+            end
+        end
+    else
+        redis.call('ZREM', KEYS[2], uid)
+    end
+end
+return #uids
+"""
+
+
+class CartStore:
+    """
+    Робочий набір кошиків у Redis (hash cart:<user_id>: article -> quantity) з
+    write-behind у таблицю cart. Кожна зміна — атомарний Lua-скрипт, що також позначає
+    користувача "брудним"; фоновий writer пачками переносить брудні кошики в Postgres.
+    Postgres лишається джерелом істини: відсутній у Redis кошик підтягується з таблиці.
+
+    Кошики магазинів ще й резервують товар: ті самі скрипти підтримують реєстр
+    cart:reserved ([магазин:]article -> сума в кошиках), тож перевірка "залишок мінус
+    чужі резерви" — O(1). Резерв знімається при оформленні/очищенні та для кошиків,
+    яких не чіпали CART_RESERVATION_TTL; після кожного імпорту реєстр перебудовується.
+    """
+
+    def __init__(self):
+        self._set_item = redis.register_script(SET_ITEM_LUA)
+        self._set_items = redis.register_script(SET_ITEMS_LUA)
+        self._load = redis.register_script(LOAD_LUA)
+        self._remove_lines = redis.register_script(REMOVE_LINES_LUA)
+        self._claim = redis.register_script(CLAIM_LUA)
+        self._restore = redis.register_script(RESTORE_LUA)
+        self._release = redis.register_script(RELEASE_LUA)
+        self._rebuild = redis.register_script(REBUILD_LUA)
+        self._clamp = redis.register_script(CLAMP_LUA)
+        self._drop = redis.register_script(DROP_LUA)
+        self._task: asyncio.Task | None = None
+        # writer, reconcile() і stop() пишуть по черзі: інакше старіший знімок кошика
+        # з паралельної пачки може закомітитись останнім
+        self._flush_lock = asyncio.Lock()
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"cart:{user_id}"
+
+    async def _ensure_loaded(self, user_id: int):
+        key = self._key(user_id)
+        if await redis.exists(key):
+            return
+        rows = await db.fetch_all("SELECT article, quantity FROM cart WHERE user_id = $1", user_id)
+        args = [config.CART_REDIS_TTL]
+        for r in rows:
+            args += [r['article'], r['quantity']]
+        await self._load(keys=[key], args=args)
+
+    # --- ЧИТАННЯ ---
+
+    async def items(self, user_id: int) -> dict[str, int]:
+        """Атомарний знімок кошика: {article: quantity}"""
+        await self._ensure_loaded(user_id)
+        raw = await redis.hgetall(self._key(user_id))
+        return {k.decode(): int(v) for k, v in raw.items() if not k.startswith(b"_")}
+
+    # --- ЗМІНИ ---
+
+    def _keys(self, user_id: int) -> list[str]:
+        return [self._key(user_id), DIRTY_KEY, RESERVED_KEY, ACTIVE_KEY]
+
+    async def set_quantity(self, user_id: int, article: str, qty: int,
+                           max_qty: int | None = None, stock: int | None = None,
+                           store_id: int | None = None) -> tuple[bool, int]:
+        """
+        Записує кількість, якщо вона не перевищує max_qty (None — без ліміту); qty <= 0 — видалити рядок.
+        stock — доступний залишок для кошика магазину (з нього віднімаються резерви інших кошиків
+        того ж store_id); None — кошик не резервує товар.
+        Повертає (записано?, кількість або доступний максимум).
+        """
+        await self._ensure_loaded(user_id)
+        ok, value = await self._set_item(
+            keys=self._keys(user_id),
+            args=[article, qty, user_id, config.CART_REDIS_TTL,
+                  -1 if max_qty is None else max_qty, -1 if stock is None else stock, time.time(),
+                  '' if store_id is None else store_id]
+        )
+        return bool(ok), int(value)
+
+    async def set_many(self, user_id: int, lines: list[tuple[str, int, int | None, int | None]],
+                       reserving: bool = False, store_id: int | None = None) -> list[tuple[bool, int]]:
+        """
+        Пакетний запис [(article, qty, max_qty, stock)] одним Lua-викликом.
+        Повертає [(прийнято?, кількість або доступний максимум)] для кожного рядка.
+        """
+        if not lines:
+            return []
+        await self._ensure_loaded(user_id)
+        args = [user_id, config.CART_REDIS_TTL, time.time(), int(reserving), '' if store_id is None else store_id]
+        for article, qty, max_qty, stock in lines:
+            args += [article, qty, -1 if max_qty is None else max_qty, -1 if stock is None else stock]
+        result = await self._set_items(keys=self._keys(user_id), args=args)
+        return [(bool(result[i]), int(result[i + 1])) for i in range(0, len(result), 2)]
+
+    async def remove_lines(self, user_id: int, snapshot: dict[str, int]):
+        """Прибирає оформлені рядки і їх резерв (якщо користувач встиг щось змінити — зміни лишаються)"""
+        args = [user_id]
+        for article, qty in snapshot.items():
+            args += [article, qty]
+        await self._remove_lines(keys=self._keys(user_id)[:3], args=args)
+
+    async def claim(self, user_id: int) -> dict[str, int]:
+        """
+        Атомарно забирає з кошика всі рядки для оформлення: {article: quantity}.
+        Другий одночасний виклик (подвійне натискання) отримає порожній кошик.
+        """
+        await self._ensure_loaded(user_id)
+        raw = await self._claim(keys=self._keys(user_id)[:3], args=[user_id])
+        return {raw[i].decode(): int(raw[i + 1]) for i in range(0, len(raw), 2)}
+
+    async def restore(self, user_id: int, lines: dict[str, int]):
+        """Повертає забрані claim() рядки (замовлення не записалось)"""
+        args = [user_id, config.CART_REDIS_TTL]
+        for article, qty in lines.items():
+            args += [article, qty]
+        await self._restore(keys=self._keys(user_id)[:3], args=args)
+
+    async def clear(self, user_id: int):
+        await self.remove_lines(user_id, await self.items(user_id))
+
+    async def drop_idle(self, user_ids: list[int]):
+        """Прибирає з Redis (разом із резервами) кошики, видалені з Postgres як покинуті"""
+        async with redis.pipeline(transaction=False) as pipe:
+            for uid in user_ids:
+                await self._drop(keys=self._keys(uid), args=[uid], client=pipe)
+            await pipe.execute()
+
+    # --- РЕЗЕРВИ ---
+
+    async def release_stale(self) -> int:
+        """Знімає резерви кошиків, яких не чіпали CART_RESERVATION_TTL. Повертає кількість кошиків."""
+        cutoff = time.time() - config.CART_RESERVATION_TTL
+        stale = await redis.zrangebyscore(ACTIVE_KEY, "-inf", cutoff, start=0, num=config.CART_FLUSH_BATCH)
+        released = 0
+        for raw in stale:
+            uid = int(raw)
+            released += await self._release(keys=[self._key(uid), RESERVED_KEY, ACTIVE_KEY], args=[uid, cutoff])
+        if released:
+            logger.info(f"🛒 Released reservations of {released} stale carts")
+        return released
+
+    async def rebuild_reservations(self):
+        """Перераховує реєстр резервів з нуля (після імпорту / старту)"""
+        carts = await self._rebuild(keys=[RESERVED_KEY, ACTIVE_KEY], args=["cart:"])
+        logger.info(f"🛒 Reservation ledger rebuilt from {carts} carts")
+
+    async def reconcile(self, store_id: int | None = None) -> list:
+        """
+        Після імпорту: урізає рядки кошиків магазинів, що більші за новий залишок
+        (для прив'язаних до магазину — за залишком їхнього магазину в store_stock).
+        Одним запитом по всіх кошиках: залишок розподіляється між кошиками за часом
+        зміни (раніші — першими), зайве урізається, рядки з нулем видаляються.
+        store_id — лише кошики цього магазину (після імпорту його файлу).
+        Повертає змінені рядки (user_id, article, name, old_qty, new_qty).
+        """
+        # Спершу все з Redis у Postgres, щоб рахувати по актуальних кількостях
+        while await self.flush() > 0:
+            pass
+
+        changed = await db.fetch_all("""
+            WITH lines AS (
+                SELECT c.user_id, c.article, c.quantity, p.name,
+                       GREATEST(floor(CASE WHEN u.store_id IS NULL THEN p.stock_qty
+                                           ELSE coalesce(s.stock_qty, 0) END)::int - $1, 0) AS available,
+                       sum(c.quantity) OVER (
+                           PARTITION BY u.store_id, c.article ORDER BY c.updated_at, c.user_id
+                       ) AS running
+                FROM cart c
+                JOIN users u ON u.user_id = c.user_id AND u.role = 'shop'
+                JOIN products p ON p.article = c.article
+                LEFT JOIN store_stock s ON s.store_id = u.store_id AND s.article = c.article
+                WHERE $2::int IS NULL OR u.store_id = $2
+            ), over AS (
+                SELECT user_id, article, name, quantity AS old_qty,
+                       GREATEST(LEAST(quantity, available - (running - quantity)), 0)::int AS new_qty
+                FROM lines
+                WHERE running > available
+            ), updated AS (
+                UPDATE cart c SET quantity = o.new_qty
+                FROM over o
+                WHERE c.user_id = o.user_id AND c.article = o.article AND o.new_qty > 0
+            ), deleted AS (
+                DELETE FROM cart c
+                USING over o
+                WHERE c.user_id = o.user_id AND c.article = o.article AND o.new_qty = 0
+            )
+            SELECT * FROM over ORDER BY user_id, name
+        """, config.STOCK_RESERVE, store_id)
+
+        if changed:
+            by_user: dict[int, list] = {}
+            for r in changed:
+                by_user.setdefault(r['user_id'], []).extend([r['article'], r['old_qty'], r['new_qty']])
+            async with redis.pipeline(transaction=False) as pipe:
+                for uid, args in by_user.items():
+                    await self._clamp(keys=[self._key(uid), RESERVED_KEY], args=args, client=pipe)
+                await pipe.execute()
+            logger.info(f"🛒 Reconciliation: clamped {len(changed)} lines in {len(by_user)} carts")
+        return changed
+
+    # --- WRITE-BEHIND ---
+
+    async def start(self):
+        await self.rebuild_reservations()
+        self._task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        """Зупиняє writer і скидає в Postgres усе, що ще не записано"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while await self.flush() > 0:
+            pass
+
+    async def _writer(self):
+        while True:
+            await asyncio.sleep(config.CART_FLUSH_INTERVAL)
+            try:
+                # Поки є черга — пишемо пачками без паузи
+                while await self.flush() >= config.CART_FLUSH_BATCH:
+                    pass
+                await self.release_stale()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cart write-behind failed: {e}")
+
+    async def flush(self) -> int:
+        """Записує одну пачку брудних кошиків. Повертає кількість користувачів у пачці."""
+        async with self._flush_lock:
+            raw = await redis.spop(DIRTY_KEY, config.CART_FLUSH_BATCH)
+            if not raw:
+                return 0
+            await self._flush_users([int(u) for u in raw])
+            return len(raw)
+
+    async def _flush_users(self, user_ids: list[int]):
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for uid in user_ids:
+                    pipe.hgetall(self._key(uid))
+                snapshots = await pipe.execute()
+
+            # Кошик міг зникнути з Redis (TTL) — тоді в ньому нічого не змінювалось, не чіпаємо
+            present = [uid for uid, snap in zip(user_ids, snapshots) if snap]
+            uids, articles, qtys = [], [], []
+            for uid, snap in zip(user_ids, snapshots):
+                for k, v in snap.items():
+                    if not k.startswith(b"_"):
+                        uids.append(uid)
+                        articles.append(k.decode())
+                        qtys.append(int(v))
+
+            async with db.pool.acquire() as connection:
+                async with connection.transaction():
+                    await connection.execute("DELETE FROM cart WHERE user_id = ANY($1::bigint[])", present)
+                    # JOIN з products відкидає товари, видалені імпортом (FK)
+                    await connection.execute("""
+                        INSERT INTO cart (user_id, article, quantity, updated_at)
+                        SELECT t.user_id, t.article, t.quantity, CURRENT_TIMESTAMP
+                        FROM unnest($1::bigint[], $2::text[], $3::int[]) AS t(user_id, article, quantity)
+                        JOIN products p ON p.article = t.article
+                    """, uids, articles, qtys)
+
+            logger.debug(f"🛒 Cart write-behind: {len(present)} carts, {len(articles)} lines")
+        except (Exception, asyncio.CancelledError):
+            # Не втрачаємо зміни (і при зупинці посеред пачки): повертаємо користувачів у чергу
+            await redis.sadd(DIRTY_KEY, *user_ids)
+            raise
+
+
+cart_store = CartStore()
@@ -0,0 +1,56 @@
+from loguru import logger
+
+from src.database.db import db
+
+# ABC: частка в сукупних продажах (грн), накопичена до товару включно з попередніми
+ABC_A = 0.80
+ABC_B = 0.95
+# XYZ: коефіцієнт варіації sales_qty між імпортами
+XYZ_X = 0.10
+XYZ_Y = 0.25
+# Скільки імпортів потрібно, щоб оцінювати стабільність продажів
+XYZ_MIN_SNAPSHOTS = 3
+
+
+class ClassifierService:
+    """
+    ABC/XYZ-аналіз каталогу в products.cluster ("DP"): напр. "AX", "BZ", або лише "C",
+    поки імпортів замало для XYZ.
+    ABC — за накопиченою часткою sales_sum (віконна сума по відсортованому каталогу),
+    XYZ — за коефіцієнтом варіації продажів, статистику якого імпорт оновлює інкрементально
+    (sales_n / sales_mean / sales_m2). Перерахунок — один UPDATE по всьому каталогу,
+    записуються лише товари, чий клас змінився.
+    """
+
+    async def refresh(self) -> int:
+        status = await db.execute("""
+            WITH ranked AS (
+                SELECT article,
+                       sum(sales_sum) OVER (ORDER BY sales_sum DESC, article) - sales_sum AS share_before,
+                       sum(sales_sum) OVER () AS total,
+                       CASE WHEN sales_n >= $5 AND sales_mean > 0
+                            -- m2 може піти трохи в мінус через похибку округлення REAL
+                            THEN sqrt(greatest(sales_m2, 0) / (sales_n - 1)) / sales_mean END AS cv
+                FROM products
+            ), classes AS (
+                SELECT article,
+                       CASE WHEN total <= 0 THEN 'C'
+                            WHEN share_before < total * $1 THEN 'A'
+                            WHEN share_before < total * $2 THEN 'B'
+                            ELSE 'C' END
+                       || CASE WHEN cv IS NULL THEN ''
+                               WHEN cv <= $3 THEN 'X'
+                               WHEN cv <= $4 THEN 'Y'
+                               ELSE 'Z' END AS cluster
+                FROM ranked
+            )
+            UPDATE products p SET cluster = c.cluster
+            FROM classes c
+            WHERE p.article = c.article AND p.cluster IS DISTINCT FROM c.cluster
+        """, ABC_A, ABC_B, XYZ_X, XYZ_Y, XYZ_MIN_SNAPSHOTS)
+        changed = int(status.split()[-1])
+        logger.info(f"🏷 ABC/XYZ classes updated: {changed}")
+        return changed
+
+
+classifier = ClassifierService()
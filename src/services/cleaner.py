@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime
+
+from loguru import logger
+
+from src.config import config
+from src.database.db import db
+from src.services.cart_store import cart_store
+
+# Пауза між пачками, щоб прибирання не заважало звичайним запитам
+BATCH_PAUSE = 0.1
+
+
+class CartCleaner:
+    """
+    Фонове видалення покинутих кошиків: рядки cart без змін довше за CART_IDLE_TTL
+    видаляються пачками по CART_CLEANUP_BATCH (за індексом idx_cart_updated_at),
+    кожна пачка — окрема коротка транзакція без довгих блокувань.
+    """
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self.runs = 0
+        self.removed_rows = 0
+        self.last_removed = 0
+        self.last_run: datetime | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cart cleanup failed: {e}")
+            await asyncio.sleep(config.CART_CLEANUP_INTERVAL)
+
+    async def run_once(self) -> int:
+        """Один прохід прибирання. Повертає кількість видалених рядків."""
+        removed = 0
+        while True:
+            rows = await db.fetch_all("""
+                DELETE FROM cart
+                WHERE ctid = ANY(ARRAY(
+                    SELECT ctid FROM cart
+                    WHERE updated_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+                    ORDER BY updated_at
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                ))
+                RETURNING user_id
+            """, float(config.CART_IDLE_TTL), config.CART_CLEANUP_BATCH)
+            if not rows:
+                break
+
+            removed += len(rows)
+            await cart_store.drop_idle(list({r['user_id'] for r in rows}))
+            if len(rows) < config.CART_CLEANUP_BATCH:
+                break
+            await asyncio.sleep(BATCH_PAUSE)
+
+        self.runs += 1
+        self.removed_rows += removed
+        self.last_removed = removed
+        self.last_run = datetime.now()
+        if removed:
+            logger.info(f"🧹 Cart cleanup: removed {removed} idle cart lines")
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "removed_rows": self.removed_rows,
+            "last_removed": self.last_removed,
+            "last_run": self.last_run,
+        }
+
+
+cart_cleaner = CartCleaner()
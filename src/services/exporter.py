@@ -1,8 +1,19 @@
+import asyncio
 import os
 import re
+import shutil
+import tempfile
 from datetime import datetime
 
 import pandas as pd
+from openpyxl.styles import PatternFill
+
+# Кольори класів ABC у стовпчику DP
+ABC_FILLS = {
+    'A': PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid"),
+    'B': PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid"),
+    'C': PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid"),
+}
 
 
 class ExporterService:
@@ -17,6 +28,15 @@ class ExporterService:
         Генерує файли замовлень з кошика.
         grouping_mode: 'department' (по відділах) або 'supplier' (по постачальниках)
         """
+        # Запис xlsx блокуючий — виносимо з event loop
+        return await asyncio.to_thread(self.write_order_files, items, grouping_mode)
+
+    def write_order_files(self, items, grouping_mode):
+        """
+        Синхронна частина generate_order_files: повертає шляхи створених файлів.
+        Кожен виклик пише у власний тимчасовий каталог (одночасні звіти/замовлення з
+        однаковими іменами файлів не перезаписують одне одного) — прибирати через cleanup().
+        """
         df = pd.DataFrame(items)
         
         # Базовий словник колонок
@@ -40,8 +60,8 @@ class ExporterService:
         timestamp = datetime.now().strftime("%d-%m_%H-%M")
         output_files = []
         
-        temp_dir = "data/temp"
-        os.makedirs(temp_dir, exist_ok=True)
+        os.makedirs("data/temp", exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix="order_", dir="data/temp")
 
         # Логіка групування
         if grouping_mode == 'department':
@@ -73,11 +93,24 @@ class ExporterService:
 
         return output_files
 
+    def cleanup(self, paths):
+        """Видаляє файли generate_order_files/export_full_base разом з їхнім тимчасовим каталогом"""
+        for directory in {os.path.dirname(p) for p in paths}:
+            shutil.rmtree(directory, ignore_errors=True)
+
 
     async def export_full_base(self, items, department_filter=None):
         """
         Експортує базу товарів (або її частину) у форматі, ідентичному до імпорту.
         """
+        # Запис xlsx і заливка DP по клітинках блокуючі — виносимо з event loop
+        return await asyncio.to_thread(self.write_full_base, items, department_filter)
+
+    def write_full_base(self, items, department_filter=None):
+        """
+        Синхронна частина export_full_base: повертає шлях файлу у власному
+        тимчасовому каталозі — прибирати через cleanup().
+        """
         df = pd.DataFrame(items)
         
         # 1. Розбиваємо category_path назад на колонки (Департамент, Група...)
@@ -130,11 +163,21 @@ class ExporterService:
         else:
             filename = f"Export_FULL_Base_{timestamp}.xlsx"
             
-        temp_dir = "data/temp"
-        os.makedirs(temp_dir, exist_ok=True)
+        os.makedirs("data/temp", exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix="export_", dir="data/temp")
         filepath = os.path.join(temp_dir, filename)
         
-        df_final.to_excel(filepath, index=False)
+        with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+            df_final.to_excel(writer, index=False)
+            if "DP" in df_final.columns:
+                self._color_abc(writer.sheets['Sheet1'], df_final.columns.get_loc("DP") + 1)
         return filepath
 
+    def _color_abc(self, sheet, column: int):
+        """Заливка клітинок DP за класом ABC (перша літера)"""
+        for (cell,) in sheet.iter_rows(min_row=2, min_col=column, max_col=column):
+            fill = ABC_FILLS.get(str(cell.value or '')[:1])
+            if fill:
+                cell.fill = fill
+
 exporter = ExporterService()
\ No newline at end of file
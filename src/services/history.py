@@ -0,0 +1,85 @@
+import re
+from datetime import date
+
+from loguru import logger
+
+from src.config import config
+from src.database.db import db
+
+HISTORY_COLUMNS = ['article', 'snapshot_date', 'sales_qty', 'sales_sum', 'stock_qty', 'stock_sum']
+PARTITION_NAME = re.compile(r"^product_history_(\d{4})_(\d{2})$")
+
+
+def _month_start(day: date, shift: int = 0) -> date:
+    month = day.year * 12 + day.month - 1 + shift
+    return date(month // 12, month % 12 + 1, 1)
+
+
+class HistoryService:
+    """
+    Історія імпортів: кожен імпорт дописує компактний знімок (артикул, дата, продажі,
+    залишок) у product_history через COPY. Таблиця секціонована по місяцях, тож
+    старі місяці видаляються цілою секцією, а запити за останні N тижнів читають
+    лише потрібні секції.
+    """
+
+    async def append(self, df):
+        """Знімок імпорту (DataFrame з article, sales_*, stock_*) за сьогодні"""
+        today = date.today()
+        columns = [df['article'].astype(str).tolist(), [today] * len(df)]
+        for col in HISTORY_COLUMNS[2:]:
+            columns.append(df[col].astype(float).tolist() if col in df.columns else [0.0] * len(df))
+
+        async with db.pool.acquire() as connection:
+            await self._ensure_partition(connection, today)
+            async with connection.transaction():
+                # Повторний імпорт того ж дня замінює знімок
+                await connection.execute("DELETE FROM product_history WHERE snapshot_date = $1", today)
+                await connection.copy_records_to_table(
+                    'product_history', records=list(zip(*columns)), columns=HISTORY_COLUMNS
+                )
+        logger.info(f"🗄 History snapshot {today}: {len(df)} rows")
+        await self.drop_expired()
+
+    async def _ensure_partition(self, connection, day: date):
+        start = _month_start(day)
+        await connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS product_history_{start:%Y_%m}
+            PARTITION OF product_history
+            FOR VALUES FROM ('{start}') TO ('{_month_start(day, 1)}')
+        """)
+
+    async def drop_expired(self):
+        """Видаляє секції, старші за HISTORY_RETENTION_MONTHS (без DELETE по рядках)"""
+        cutoff = _month_start(date.today(), -config.HISTORY_RETENTION_MONTHS)
+        partitions = await db.fetch_all("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'product_history'
+        """)
+        for r in partitions:
+            match = PARTITION_NAME.match(r['relname'])
+            if not match or date(int(match.group(1)), int(match.group(2)), 1) >= cutoff:
+                continue
+            # DETACH CONCURRENTLY не блокує читання історії
+            await db.execute(f"ALTER TABLE product_history DETACH PARTITION {r['relname']} CONCURRENTLY")
+            await db.execute(f"DROP TABLE {r['relname']}")
+            logger.info(f"🗄 Dropped history partition {r['relname']}")
+
+    async def velocity(self, articles: list[str], weeks: int | None = None) -> dict[str, dict]:
+        """
+        Швидкість продажів за останні N тижнів: {article: {'per_week', 'snapshots'}}.
+        sales_qty у знімку — продажі за AUTO_ORDER_PERIOD_DAYS, тож беремо середнє по знімках.
+        """
+        weeks = weeks or config.HISTORY_VELOCITY_WEEKS
+        rows = await db.fetch_all("""
+            SELECT article, avg(sales_qty) * 7 / $3 AS per_week, count(*) AS snapshots
+            FROM product_history
+            WHERE article = ANY($1::text[]) AND snapshot_date >= CURRENT_DATE - $2 * 7
+            GROUP BY article
+        """, articles, weeks, config.AUTO_ORDER_PERIOD_DAYS)
+        return {r['article']: {'per_week': r['per_week'], 'snapshots': r['snapshots']} for r in rows}
+
+
+history = HistoryService()
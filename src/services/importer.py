@@ -3,6 +3,16 @@ import asyncio
 import pandas as pd
 from src.config import config
 from src.database.db import db
+from src.database.redis_cache import redis
+from src.services.cart_store import cart_store
+from src.services.classifier import classifier
+from src.services.history import history
+from src.services.search_index import search_index
+from src.services.snapshot import product_snapshot
+from src.services.summary import summary
+
+# Спільний для всіх процесів бота лічильник імпортів
+GENERATION_KEY = "import:generation"
 
 # Маппинг колонок (Excel -> DB)
 COLUMN_MAPPING = {
@@ -15,10 +25,46 @@ COLUMN_MAPPING = {
     "Розхід, кіл.": "sales_qty",
     "Розхід ц.р., грн.": "sales_sum",
     "Залишок, кіл.": "stock_qty",
-    "Залишок, грн.": "stock_sum"
+    "Залишок, грн.": "stock_sum",
+    "Кратність": "pack_size"
 }
 
+NUMERIC_COLUMNS = ['sales_qty', 'sales_sum', 'stock_qty', 'stock_sum', 'department', 'pack_size']
+
+
+def read_table(file_path: str) -> pd.DataFrame:
+    """Читає .csv/.xlsb/.xlsx (синхронно — викликати через asyncio.to_thread)"""
+    if file_path.lower().endswith('.csv'):
+        return pd.read_csv(file_path)
+    elif file_path.lower().endswith('.xlsb'):
+        # xlsb читається швидше
+        return pd.read_excel(file_path, engine='pyxlsb')
+    else:
+        # Стандартний xlsx (найповільніший)
+        return pd.read_excel(file_path, engine='openpyxl')
+
+
+def to_numeric(df: pd.DataFrame, columns=NUMERIC_COLUMNS) -> pd.DataFrame:
+    """Числові колонки з Excel ("1 234,5") -> float, нечислове -> 0"""
+    for col in columns:
+        if col in df.columns:
+            # Чистимо від пробілів та ком
+            df[col] = pd.to_numeric(
+                df[col].astype(str).str.replace(',', '.').replace('\xa0', '').replace(' ', ''), 
+                errors='coerce'
+            ).fillna(0)
+    return df
+
+
 class ImporterService:
+    def __init__(self):
+        # Номер "покоління" даних: збільшується після кожного успішного імпорту,
+        # кеші порівнюють його зі своїм, щоб скинути застарілі дані.
+        # Джерело — Redis (GENERATION_KEY); тут локальна копія, яку оновлює current_generation()
+        self.generation = 0
+        # Рядки кошиків, урізані після останнього імпорту (для повідомлень магазинам)
+        self.cart_adjustments = []
+
     async def import_file(self, file_path: str, status_callback=None) -> int:
         """
         Читає файл, фільтрує дані та оновлює базу.
@@ -32,19 +78,8 @@ class ImporterService:
 
             logging.info(f"📖 Починаю читання файлу (в окремому потоці): {file_path}")
 
-            # Визначаємо функцію для читання (щоб передати в потік)
-            def read_data():
-                if file_path.lower().endswith('.csv'):
-                    return pd.read_csv(file_path)
-                elif file_path.lower().endswith('.xlsb'):
-                    # xlsb читається швидше
-                    return pd.read_excel(file_path, engine='pyxlsb')
-                else:
-                    # Стандартний xlsx (найповільніший)
-                    return pd.read_excel(file_path, engine='openpyxl')
-
             # 🔥 МАГІЯ ТУТ: Запускаємо читання в окремому потоці, не блокуємо бота
-            df = await asyncio.to_thread(read_data)
+            df = await asyncio.to_thread(read_table, file_path)
 
             if df is None:
                 raise ValueError("Не вдалося прочитати файл (DataFrame is None)")
@@ -89,14 +124,11 @@ class ImporterService:
             if 'article' in df.columns:
                 df['article'] = df['article'].astype(str)
             
-            numeric_cols = ['sales_qty', 'sales_sum', 'stock_qty', 'stock_sum', 'department']
-            for col in numeric_cols:
-                if col in df.columns:
-                    # Чистимо від пробілів та ком
-                    df[col] = pd.to_numeric(
-                        df[col].astype(str).str.replace(',', '.').replace('\xa0', '').replace(' ', ''), 
-                        errors='coerce'
-                    ).fillna(0)
+            df = to_numeric(df)
+
+            # Повторний артикул у файлі — беремо останній рядок (PK history і upsert — по артикулу)
+            if 'article' in df.columns:
+                df = df.drop_duplicates(subset='article', keep='last')
 
             # Фільтрація
             initial_count = len(df)
@@ -121,6 +153,11 @@ class ImporterService:
             if total == 0:
                 return 0
 
+            # Довідник категорій: створюємо відсутні вузли і проставляємо category_id
+            category_ids = await self._sync_categories(df)
+            for row in records:
+                row['category_id'] = category_ids.get((int(row.get('department', 0)), row.get('category_path', '')))
+
             # --- ЕТАП 3: ВСТАВКА (З ПРОГРЕСОМ) ---
             batch_size = 1000
             processed = 0
@@ -135,12 +172,90 @@ class ImporterService:
                 if status_callback:
                     await status_callback(processed, total, "inserting")
 
+            # Товари могли переїхати в інші групи — прибираємо вузли, під якими не лишилось товарів
+            await self._prune_categories()
+
+            # --- ЕТАП 4: ІСТОРІЯ, ABC/XYZ, ЗВЕДЕННЯ ---
+            await history.append(df)
+            await classifier.refresh()
+            await summary.refresh()
+
+            # --- ЕТАП 5: ПОШУКОВИЙ ІНДЕКС ---
+            if config.SEARCH_BACKEND == "index":
+                await search_index.update(df)
+
+            # --- ЕТАП 6: КОШИКИ І РЕЄСТР РЕЗЕРВІВ ---
+            self.cart_adjustments = await cart_store.reconcile()
+            await cart_store.rebuild_reservations()
+
+            self.generation = await redis.incr(GENERATION_KEY)
+
+            # --- ЕТАП 7: ЗНІМОК ДЛЯ АНАЛІТИКИ (ЗВІТИ, АВТОЗАМОВЛЕННЯ) ---
+            await product_snapshot.refresh(self.generation)
             return total
 
         except Exception as e:
             logging.error(f"Import Error: {e}")
             raise e
 
+    async def current_generation(self) -> int:
+        """Поточне покоління з Redis (імпорт міг пройти в іншому процесі)"""
+        self.generation = int(await redis.get(GENERATION_KEY) or 0)
+        return self.generation
+
+    async def _sync_categories(self, df) -> dict:
+        """
+        Підтримує таблицю categories (дерево Департамент/Піддеп-т/Група/Підгрупа в межах відділу).
+        Вставляє рівень за рівнем одним запитом на рівень і повертає {(відділ, шлях): id листа}.
+        """
+        if 'category_path' not in df.columns:
+            return {}
+
+        depts = df['department'] if 'department' in df.columns else pd.Series(0, index=df.index)
+        pairs = {(int(dept), path) for dept, path in zip(depts, df['category_path'])}
+        paths = [(dept, path.split('/')) for dept, path in pairs if path]
+        if not paths:
+            return {}
+
+        ids = {}
+        max_depth = max(len(parts) for _, parts in paths)
+
+        async with db.pool.acquire() as connection:
+            for depth in range(1, max_depth + 1):
+                level = {(dept, '/'.join(parts[:depth])) for dept, parts in paths if len(parts) >= depth}
+                keys = []
+                for dept, path in level:
+                    parent_path, _, name = path.rpartition('/')
+                    parent_id = ids[(dept, parent_path)] if parent_path else None
+                    keys.append((dept, parent_id, name, path))
+
+                # DO UPDATE (а не DO NOTHING), щоб RETURNING повернув і вже існуючі вузли
+                rows = await connection.fetch("""
+                    INSERT INTO categories (department, parent_id, name, depth)
+                    SELECT d, p, n, $4 FROM unnest($1::int[], $2::int[], $3::text[]) AS t(d, p, n)
+                    ON CONFLICT (department, parent_id, name) DO UPDATE SET depth = EXCLUDED.depth
+                    RETURNING id, department, parent_id, name
+                """, [k[0] for k in keys], [k[1] for k in keys], [k[2] for k in keys], depth)
+
+                by_key = {(r['department'], r['parent_id'], r['name']): r['id'] for r in rows}
+                for dept, parent_id, name, path in keys:
+                    ids[(dept, path)] = by_key[(dept, parent_id, name)]
+
+        return ids
+
+    async def _prune_categories(self):
+        """Видаляє категорії, в піддереві яких немає жодного товару (інакше меню веде в порожні групи)"""
+        status = await db.execute("""
+            WITH RECURSIVE used AS (
+                SELECT DISTINCT c.id, c.parent_id
+                FROM categories c JOIN products p ON p.category_id = c.id
+                UNION
+                SELECT c.id, c.parent_id FROM categories c JOIN used u ON c.id = u.parent_id
+            )
+            DELETE FROM categories WHERE id NOT IN (SELECT id FROM used)
+        """)
+        logging.info(f"🗂 Importer: порожні категорії прибрано ({status})")
+
     async def _insert_batch(self, batch):
         values = []
         for row in batch:
@@ -155,26 +270,41 @@ class ImporterService:
                 float(row.get('sales_qty', 0)), 
                 float(row.get('sales_sum', 0)),
                 float(row.get('stock_qty', 0)), 
-                float(row.get('stock_sum', 0))
+                float(row.get('stock_sum', 0)),
+                row.get('category_id'),
+                max(int(row.get('pack_size') or 1), 1)
             ))
 
         query = """
             INSERT INTO products (
                 article, name, department, category_path, supplier, resident, cluster,
-                sales_qty, sales_sum, stock_qty, stock_sum, updated_at
+                sales_qty, sales_sum, stock_qty, stock_sum, category_id, pack_size,
+                sales_n, sales_mean, sales_m2, sales_stats_date, updated_at
             )
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, CURRENT_TIMESTAMP)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, 1, $8, 0, CURRENT_DATE, CURRENT_TIMESTAMP)
             ON CONFLICT (article) DO UPDATE SET
                 name = EXCLUDED.name,
                 department = EXCLUDED.department,
                 category_path = EXCLUDED.category_path,
                 supplier = EXCLUDED.supplier,
                 resident = EXCLUDED.resident,
-                cluster = EXCLUDED.cluster,
                 sales_qty = EXCLUDED.sales_qty,
                 sales_sum = EXCLUDED.sales_sum,
                 stock_qty = EXCLUDED.stock_qty,
                 stock_sum = EXCLUDED.stock_sum,
+                category_id = EXCLUDED.category_id,
+                pack_size = EXCLUDED.pack_size,
+                -- Статистика продажів по імпортах (алгоритм Велфорда) для XYZ; cluster рахує classifier.
+                -- Одна вибірка на день: повторний імпорт того ж дня (як і знімок history) її не додає
+                sales_n = CASE WHEN products.sales_stats_date = CURRENT_DATE THEN products.sales_n
+                               ELSE products.sales_n + 1 END,
+                sales_mean = CASE WHEN products.sales_stats_date = CURRENT_DATE THEN products.sales_mean
+                                  ELSE products.sales_mean + (EXCLUDED.sales_qty - products.sales_mean) / (products.sales_n + 1) END,
+                sales_m2 = CASE WHEN products.sales_stats_date = CURRENT_DATE THEN products.sales_m2
+                                ELSE products.sales_m2 + (EXCLUDED.sales_qty - products.sales_mean) * (
+                                    EXCLUDED.sales_qty - products.sales_mean - (EXCLUDED.sales_qty - products.sales_mean) / (products.sales_n + 1)
+                                ) END,
+                sales_stats_date = CURRENT_DATE,
                 updated_at = CURRENT_TIMESTAMP;
         """
         async with db.pool.acquire() as connection:
@@ -1,8 +1,11 @@
+import asyncio
 import re
 import sys
+import time
 import traceback
 
 from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
 from loguru import logger
 
 from src.config import config
@@ -26,9 +29,51 @@ logger.add(
     encoding="utf-8"
 )
 
+# Ліміт довжини повідомлення Telegram
+MESSAGE_LIMIT = 4096
+
+
+def _pack(texts: list[str]) -> list[list[str]]:
+    """
+    Ділить повідомлення на групи, кожна з яких, склеєна через порожній рядок,
+    не довша за MESSAGE_LIMIT
+    """
+    groups, current, size = [], [], 0
+    for text in texts:
+        text = text[:MESSAGE_LIMIT]
+        if current and size + 2 + len(text) > MESSAGE_LIMIT:
+            groups.append(current)
+            current, size = [], 0
+        size += (2 if current else 0) + len(text)
+        current.append(text)
+    if current:
+        groups.append(current)
+    return groups
+
+
 class NotifierService:
+    """
+    Сповіщення в лог-чат і користувачам. info/warning/error лише пишуть у лог і ставлять
+    повідомлення в чергу — хендлер не чекає Bot API. Фоновий відправник склеює все, що
+    набралось у чат за NOTIFY_COALESCE_WINDOW, в одне повідомлення, пише в один чат не
+    частіше за NOTIFY_CHAT_INTERVAL і загалом не частіше за NOTIFY_RATE. Понад
+    NOTIFY_MAX_PENDING на чат повідомлення відкидаються і підсумовуються одним рядком.
+    """
+
     def __init__(self):
         self.log_chat_id = config.LOG_CHAT_ID
+        self._bot: Bot | None = None
+        # chat_id -> тексти в черзі; час першого з них; найраніший дозволений час відправки
+        self._pending: dict[int | str, list[str]] = {}
+        self._first_at: dict[int | str, float] = {}
+        self._next_at: dict[int | str, float] = {}
+        self._dropped: dict[int | str, int] = {}
+        # Тексти, які відправник уже забрав з черги, але ще не відправив
+        self._in_flight: list[str] = []
+        self._wakeup = asyncio.Event()
+        self._sender: asyncio.Task | None = None
+        self._flushing = False
+        self._stats = {'queued': 0, 'sent': 0, 'dropped': 0}
 
     def _clean_html(self, text: str) -> str:
         """Видаляє HTML теги для чистого логу в консолі/файлі"""
@@ -45,10 +90,7 @@ class NotifierService:
         
         # У Telegram відправляємо красивий (з форматуванням <b>)
         if self.log_chat_id:
-            try:
-                await bot.send_message(self.log_chat_id, f"ℹ️ <b>INFO:</b>\n{text}", parse_mode="HTML")
-            except Exception as e:
-                logger.error(f"Не вдалося відправити лог в ТГ: {e}")
+            self._enqueue(bot, self.log_chat_id, f"ℹ️ <b>INFO:</b>\n{text}")
 
     async def warning(self, bot: Bot, text: str):
         """
@@ -57,9 +99,7 @@ class NotifierService:
         logger.warning(self._clean_html(text))
         
         if self.log_chat_id:
-            try:
-                await bot.send_message(self.log_chat_id, f"⚠️ <b>WARNING:</b>\n{text}", parse_mode="HTML")
-            except: pass
+            self._enqueue(bot, self.log_chat_id, f"⚠️ <b>WARNING:</b>\n{text}")
 
     async def error(self, bot: Bot, text: str, error: Exception = None):
         """
@@ -73,17 +113,147 @@ class NotifierService:
         logger.error(f"{clean_msg} | Error: {error_text}\n{tb}")
         
         if self.log_chat_id:
+            # Обрізаємо трейсбек, якщо він занадто довгий для Телеграм
+            short_tb = tb[-3000:] if len(tb) > 3000 else tb
+            msg = (
+                f"🚨 <b>CRITICAL ERROR!</b>\n"
+                f"📝 {text}\n"
+                f"🛑 <b>Error:</b> {error_text}\n\n"
+                f"<code>{short_tb}</code>"
+            )
+            self._enqueue(bot, self.log_chat_id, msg)
+
+    def queue_batch(self, bot: Bot, messages: list[tuple[int, str]]):
+        """Розсилка [(chat_id, text)] через ту саму чергу (по повідомленню на користувача)"""
+        for chat_id, text in messages:
+            self._enqueue(bot, chat_id, text)
+
+    def stats(self) -> dict:
+        pending = sum(len(texts) for texts in self._pending.values()) + len(self._in_flight)
+        return {**self._stats, 'pending': pending}
+
+    # --- ЧЕРГА ---
+
+    def _enqueue(self, bot: Bot, chat_id: int | str, text: str):
+        self._bot = bot
+        pending = self._pending.setdefault(chat_id, [])
+        if len(pending) >= config.NOTIFY_MAX_PENDING:
+            # Перевантаження: не накопичуємо, лише рахуємо (піде одним рядком з наступною відправкою)
+            self._dropped[chat_id] = self._dropped.get(chat_id, 0) + 1
+            self._stats['dropped'] += 1
+            return
+        if not pending:
+            self._first_at[chat_id] = time.monotonic()
+        pending.append(text)
+        self._stats['queued'] += 1
+
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    def _due(self, now: float) -> tuple[list, float | None]:
+        """Чати, яким уже можна відправляти, і скільки чекати до найближчого наступного"""
+        due, wait = [], None
+        for chat_id in self._pending:
+            ready_at = self._next_at.get(chat_id, 0)
+            if not self._flushing:
+                ready_at = max(ready_at, self._first_at[chat_id] + config.NOTIFY_COALESCE_WINDOW)
+            if ready_at <= now:
+                due.append(chat_id)
+            elif wait is None or ready_at - now < wait:
+                wait = ready_at - now
+        return due, wait
+
+    async def _run(self):
+        interval = 1 / config.NOTIFY_RATE
+        while True:
+            due, wait = self._due(time.monotonic())
+            if not due:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for chat_id in due:
+                try:
+                    await self._send(chat_id)
+                except Exception as e:
+                    logger.error(f"Не вдалося відправити сповіщення в ТГ ({chat_id}): {e}")
+                await asyncio.sleep(interval)
+
+    async def _send(self, chat_id: int | str):
+        """Одне (склеєне) повідомлення в чат; те, що не влізло, лишається на наступний раз"""
+        texts = self._pending.pop(chat_id)
+        self._first_at.pop(chat_id, None)
+        dropped = self._dropped.pop(chat_id, 0)
+        if dropped:
+            texts.append(f"… і ще {dropped} повідомлень пропущено (перевантаження)")
+
+        self._in_flight = texts
+        try:
+            await self._deliver(chat_id, texts)
+        finally:
+            self._in_flight = []
+
+    async def _deliver(self, chat_id: int | str, texts: list[str]):
+        group, *rest = _pack(texts)
+        try:
+            await self._bot.send_message(chat_id, "\n\n".join(group), parse_mode="HTML")
+            self._stats['sent'] += 1
+            self._next_at[chat_id] = time.monotonic() + config.NOTIFY_CHAT_INTERVAL
+        except TelegramRetryAfter as e:
+            # Telegram просить почекати — повертаємо повідомлення в чергу
+            rest.insert(0, group)
+            self._next_at[chat_id] = time.monotonic() + e.retry_after
+        except TelegramForbiddenError:
+            return  # користувач заблокував бота
+        except TelegramBadRequest as e:
+            # Зіпсований HTML в одному з повідомлень не має забирати з собою решту
+            logger.warning(f"Склеєне сповіщення відхилено ({chat_id}): {e}; надсилаю по одному")
+            await self._send_each(chat_id, group)
+        except Exception as e:
+            logger.error(f"Не вдалося відправити сповіщення в ТГ ({chat_id}): {e}")
+
+        if rest:
+            # Новим повідомленням у чаті не треба чекати вікно склеювання
+            self._pending[chat_id] = [text for g in rest for text in g] + self._pending.get(chat_id, [])
+            self._first_at[chat_id] = 0
+
+    async def _send_each(self, chat_id: int | str, texts: list[str]):
+        """Надсилає повідомлення окремо; те, що Telegram не розбирає як HTML, — простим текстом"""
+        for index, text in enumerate(texts):
+            if index:
+                await asyncio.sleep(config.NOTIFY_CHAT_INTERVAL)
             try:
-                # Обрізаємо трейсбек, якщо він занадто довгий для Телеграм
-                short_tb = tb[-3000:] if len(tb) > 3000 else tb
-                msg = (
-                    f"🚨 <b>CRITICAL ERROR!</b>\n"
-                    f"📝 {text}\n"
-                    f"🛑 <b>Error:</b> {error_text}\n\n"
-                    f"<code>{short_tb}</code>"
-                )
-                await bot.send_message(self.log_chat_id, msg, parse_mode="HTML")
+                try:
+                    await self._bot.send_message(chat_id, text, parse_mode="HTML")
+                except TelegramBadRequest:
+                    await self._bot.send_message(chat_id, text, parse_mode=None)
+                self._stats['sent'] += 1
             except Exception as e:
-                logger.error(f"FATAL: Не вдалося відправити помилку в ТГ: {e}")
+                logger.error(f"Не вдалося відправити сповіщення в ТГ ({chat_id}): {e}")
+        self._next_at[chat_id] = time.monotonic() + config.NOTIFY_CHAT_INTERVAL
+
+    async def stop(self):
+        """Дочищає чергу (не довше за NOTIFY_FLUSH_TIMEOUT) і зупиняє відправника"""
+        self._flushing = True
+        self._wakeup.set()
+        deadline = time.monotonic() + config.NOTIFY_FLUSH_TIMEOUT
+        # Чекаємо, поки відправник стане вільним: порожньої черги мало, поки запит ще в дорозі
+        while ((self._pending or self._in_flight) and self._sender and not self._sender.done()
+               and time.monotonic() < deadline):
+            await asyncio.sleep(0.1)
+        undelivered = self.stats()['pending']
+        if self._sender:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._sender = None
+        if undelivered:
+            logger.warning(f"Notifier: {undelivered} messages not delivered on shutdown")
 
 notifier = NotifierService()
\ No newline at end of file
@@ -0,0 +1,177 @@
+import asyncio
+
+from aiogram import Bot, types
+from loguru import logger
+
+from src.config import config
+from src.database.db import db
+from src.services.exporter import exporter
+from src.services.notifier import notifier
+
+
+class OrderService:
+    """
+    Замовлення: запис orders/order_items однією транзакцією в хендлері, а генерація
+    файлів і доставка — у фоновому worker'і з повторами. Повтор ідемпотентний:
+    worker бере замовлення через FOR UPDATE SKIP LOCKED, а files_sent не дає
+    надіслати вже доставлені файли вдруге.
+    """
+
+    def __init__(self):
+        self._bot: Bot | None = None
+        self._task: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+
+    async def create(self, user_id: int, chat_id: int, grouping_mode: str, snapshot: dict[str, int]) -> tuple[int, int] | None:
+        """
+        Записує замовлення зі знімка кошика {article: quantity}.
+        Повертає (id замовлення, кількість позицій) або None, якщо жоден товар не знайдено.
+        """
+        # Один запит = одна транзакція: замовлення без рядків не з'явиться
+        row = await db.fetch_one("""
+            WITH items AS (
+                SELECT p.article, p.name, p.department, p.supplier, t.quantity, p.unit_price
+                FROM unnest($4::text[], $5::int[]) AS t(article, quantity)
+                JOIN products p ON p.article = t.article
+            ), new_order AS (
+                INSERT INTO orders (user_id, chat_id, grouping_mode)
+                SELECT $1, $2, $3 WHERE EXISTS (SELECT 1 FROM items)
+                RETURNING id
+            ), inserted AS (
+                INSERT INTO order_items (order_id, article, name, department, supplier, quantity, unit_price)
+                SELECT new_order.id, items.* FROM new_order, items
+                RETURNING 1
+            )
+            SELECT (SELECT id FROM new_order) AS id, (SELECT count(*) FROM inserted) AS lines
+        """, user_id, chat_id, grouping_mode, list(snapshot), list(snapshot.values()))
+
+        if row['id'] is None:
+            return None
+        self._wake.set()
+        return row['id'], row['lines']
+
+    # --- WORKER ---
+
+    async def start(self, bot: Bot):
+        self._bot = bot
+        # Бот працює в одному екземплярі (polling), тож "processing" після старту — обірвана спроба
+        await db.execute("UPDATE orders SET status = 'pending' WHERE status = 'processing'")
+        self._task = asyncio.create_task(self._worker())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _worker(self):
+        while True:
+            try:
+                while await self._process_next():
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Order worker failed: {e}")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=config.ORDER_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _process_next(self) -> bool:
+        """Бере одне замовлення з черги та обробляє його. False — черга порожня."""
+        order = await db.fetch_one("""
+            UPDATE orders
+            SET status = 'processing', attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = (
+                SELECT id FROM orders
+                WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, user_id, chat_id, grouping_mode, attempts, files_sent
+        """)
+        if not order:
+            return False
+
+        try:
+            await self._deliver(order)
+        except Exception as e:
+            await self._fail(order, e)
+        return True
+
+    async def _deliver(self, order):
+        items = await db.fetch_all("""
+            SELECT article, name, department, supplier, quantity
+            FROM order_items WHERE order_id = $1
+            ORDER BY article
+        """, order['id'])
+        items = [dict(i) for i in items]
+
+        # Групи в файлах детерміновані, тож при повторі files_sent вказує на ті самі файли
+        files = await exporter.generate_order_files(items, order['grouping_mode'], order['user_id'])
+        try:
+            for index, file_path in enumerate(files):
+                if index < order['files_sent']:
+                    continue
+                await self._bot.send_document(
+                    order['chat_id'],
+                    types.FSInputFile(file_path),
+                    caption=f"✅ Замовлення №{order['id']} ({order['grouping_mode']})"
+                )
+                await db.execute(
+                    "UPDATE orders SET files_sent = $2, updated_at = CURRENT_TIMESTAMP WHERE id = $1",
+                    order['id'], index + 1
+                )
+        finally:
+            exporter.cleanup(files)
+
+        user = await db.fetch_one("SELECT username, full_name FROM users WHERE user_id = $1", order['user_id'])
+        user_info = f"{user['full_name']} (@{user['username']})" if user else str(order['user_id'])
+
+        # Далі — лише best-effort повідомлення, повтор їх не дублюватиме
+        await db.execute("""
+            UPDATE orders SET status = 'done', last_error = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = $1
+        """, order['id'])
+        await notifier.info(
+            self._bot,
+            f"🛍 <b>Нове замовлення №{order['id']}!</b>\n"
+            f"Користувач: {user_info}\n"
+            f"Позицій: {len(items)}\n"
+            f"Режим: {order['grouping_mode']}"
+        )
+        try:
+            await self._bot.send_message(order['chat_id'], f"🎉 Дякуємо! Замовлення №{order['id']} відправлено.")
+        except Exception as e:
+            logger.warning(f"Order {order['id']}: confirmation not delivered: {e}")
+
+    async def _fail(self, order, error: Exception):
+        if order['attempts'] >= config.ORDER_MAX_ATTEMPTS:
+            await db.execute("""
+                UPDATE orders SET status = 'failed', last_error = $2, updated_at = CURRENT_TIMESTAMP
+                WHERE id = $1
+            """, order['id'], str(error))
+            await notifier.error(self._bot, f"Замовлення №{order['id']} не сформовано після {order['attempts']} спроб", error)
+            try:
+                await self._bot.send_message(
+                    order['chat_id'],
+                    f"❌ Не вдалося сформувати замовлення №{order['id']}. Адміністратора повідомлено."
+                )
+            except Exception:
+                pass
+            return
+
+        delay = config.ORDER_RETRY_DELAY * 2 ** (order['attempts'] - 1)
+        await db.execute("""
+            UPDATE orders
+            SET status = 'pending', last_error = $2, updated_at = CURRENT_TIMESTAMP,
+                next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => $3)
+            WHERE id = $1
+        """, order['id'], str(error), float(delay))
+        logger.warning(f"Order {order['id']} attempt {order['attempts']} failed, retry in {delay}s: {error}")
+
+
+order_service = OrderService()
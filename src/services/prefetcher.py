@@ -0,0 +1,116 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from aiogram.types import InlineKeyboardMarkup
+from loguru import logger
+
+from src.config import config
+from src.services.screen_cache import screen_cache
+
+# loader(path, page) -> (текст, клавіатура) або None
+ScreenLoader = Callable[[str, int], Awaitable[tuple | None]]
+
+
+class Prefetcher:
+    """
+    Спекулятивне прогрівання screen_cache: після показу рівня каталогу у фоні
+    рендеримо дочірні екрани (підкатегорії / першу сторінку товарів), щоб наступний
+    клік віддався з пам'яті. Кількість фонових задач обмежена.
+
+    Метрики: hits — клік потрапив у прогрітий екран, misses — клік у непрогрітий екран,
+    wasted — прогріли, але екран витіснили/інвалідували до першого кліку.
+    """
+
+    MAX_TRACKED = 10000
+
+    def __init__(self):
+        self._semaphore = asyncio.Semaphore(config.PREFETCH_CONCURRENCY)
+        self._tasks: set[asyncio.Task] = set()
+        self._unused: OrderedDict[tuple, None] = OrderedDict()
+        self.scheduled = 0
+        self.rendered = 0
+        self.dropped = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted = 0
+
+    def record_access(self, path: str, page: int, cache_hit: bool):
+        """Викликається хендлером при кожному відкритті екрана"""
+        key = (path, page, None)
+        if key in self._unused:
+            del self._unused[key]
+            if cache_hit:
+                self.hits += 1
+            else:
+                self.wasted += 1
+                self.misses += 1
+        elif not cache_hit:
+            self.misses += 1
+
+    def schedule_children(self, markup: InlineKeyboardMarkup, loader: ScreenLoader):
+        """Ставить у чергу прогрівання дочірніх екранів з клавіатури щойно показаного рівня"""
+        if config.PREFETCH_DEPTH <= 0:
+            return
+        if len(self._tasks) >= config.PREFETCH_MAX_PENDING:
+            self.dropped += 1
+            return
+
+        self.scheduled += 1
+        task = asyncio.create_task(self._warm(child_paths(markup), loader, config.PREFETCH_DEPTH))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _warm(self, paths: list[str], loader: ScreenLoader, depth: int):
+        for path in paths[:config.PREFETCH_MAX_CHILDREN]:
+            key = (path, 0, None)
+            try:
+                screen = screen_cache.get_quiet(path)
+                if screen is None:
+                    async with self._semaphore:
+                        screen = await loader(path, 0)
+                    if screen is None:
+                        continue
+                    screen_cache.set(path, 0, None, *screen)
+                    self.rendered += 1
+                    self._track(key)
+                if depth > 1:
+                    await self._warm(child_paths(screen[1]), loader, depth - 1)
+            except Exception as e:
+                logger.warning(f"Prefetch of {path} failed: {e}")
+
+    def _track(self, key: tuple):
+        self._unused[key] = None
+        self._unused.move_to_end(key)
+        while len(self._unused) > self.MAX_TRACKED:
+            self._unused.popitem(last=False)
+            self.wasted += 1
+
+    def stats(self) -> dict:
+        # Прогріті екрани, яких уже немає в кеші, до кліку не дожили
+        for key in [k for k in self._unused if k not in screen_cache]:
+            del self._unused[key]
+            self.wasted += 1
+        return {
+            "scheduled": self.scheduled,
+            "rendered": self.rendered,
+            "dropped": self.dropped,
+            "pending": len(self._tasks),
+            "hits": self.hits,
+            "misses": self.misses,
+            "wasted": self.wasted,
+        }
+
+
+def child_paths(markup: InlineKeyboardMarkup) -> list[str]:
+    """dept_<id>/nav_<id> кнопки рівня (без останнього ряду — там "Назад")"""
+    paths = []
+    for row in markup.inline_keyboard[:-1]:
+        for button in row:
+            data = button.callback_data or ""
+            if data.startswith(("dept_", "nav_")) and data.count("_") == 1:
+                paths.append(data)
+    return paths
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,57 @@
+import numpy as np
+
+from src.config import config
+
+
+def recommend(stock_qty: np.ndarray, sales_qty: np.ndarray, pack_size: np.ndarray,
+              period_days: float | None = None, lead_time_days: float | None = None,
+              review_days: float | None = None, safety_days: float | None = None,
+              critical_stock: float = 3, min_qty: int = 2) -> np.ndarray:
+    """
+    Рекомендована кількість до замовлення для всього каталогу одним векторним проходом.
+
+    Швидкість продажів = sales_qty / period_days (шт./день). Замовляємо до рівня
+    швидкість * (час поставки + період до наступного замовлення + страховий запас у днях),
+    мінус поточний залишок. Товар з критичним залишком (< critical_stock) і продажами
+    отримує щонайменше min_qty. Результат округлюється вгору до кратності упаковки.
+    0 — замовляти не потрібно.
+    """
+    period_days = period_days or config.AUTO_ORDER_PERIOD_DAYS
+    lead_time_days = config.AUTO_ORDER_LEAD_DAYS if lead_time_days is None else lead_time_days
+    review_days = config.AUTO_ORDER_REVIEW_DAYS if review_days is None else review_days
+    safety_days = config.AUTO_ORDER_SAFETY_DAYS if safety_days is None else safety_days
+
+    stock = np.asarray(stock_qty, dtype=np.float64)
+    sales = np.asarray(sales_qty, dtype=np.float64)
+    pack = np.maximum(np.asarray(pack_size, dtype=np.float64), 1)
+
+    velocity = sales / period_days
+    need = velocity * (lead_time_days + review_days + safety_days) - stock
+
+    selling = sales > 0
+    critical = selling & (stock < critical_stock)
+    need = np.where(critical, np.maximum(need, min_qty), need)
+    need = np.where(selling, np.maximum(need, 0), 0)
+
+    return (np.ceil(need / pack) * pack).astype(np.int64)
+
+
+if __name__ == "__main__":
+    # Бенчмарк: python -m src.services.replenishment [кількість артикулів]
+    import sys
+    import time
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    rng = np.random.default_rng(42)
+    stock = rng.integers(0, 200, n).astype(np.float32)
+    sales = rng.gamma(1.5, 20, n).astype(np.float32) * (rng.random(n) > 0.3)
+    pack = rng.choice([1, 1, 1, 6, 12, 24], n)
+
+    recommend(stock[:1000], sales[:1000], pack[:1000])  # прогрів
+    runs = 10
+    started = time.perf_counter()
+    for _ in range(runs):
+        qty = recommend(stock, sales, pack)
+    elapsed = (time.perf_counter() - started) / runs
+
+    print(f"{n} articles: {elapsed * 1000:.1f} ms per pass, {int((qty > 0).sum())} to reorder")
@@ -0,0 +1,133 @@
+import asyncio
+import os
+from collections import OrderedDict
+
+from loguru import logger
+
+from src.config import config
+from src.services.exporter import exporter
+from src.services.importer import importer
+from src.services.single_flight import single_flight
+from src.services.snapshot import ProductSnapshot, product_snapshot
+from src.services.store_stock import store_stock
+
+
+def _auto_order_items(snapshot: ProductSnapshot, mode: str) -> list[dict]:
+    rows = snapshot.select(snapshot.col('recommended_qty') > 0, order_by=(mode, 'name'))
+    return [{
+        'article': r['article'],
+        'name': r['name'],
+        'quantity': int(r['recommended_qty']),
+        'department': r['department'],
+        'supplier': r['supplier'] or None  # знімок кодує NULL як '' — експорт групує такі в 'Other'
+    } for r in rows]
+
+
+def _low_stock_items(snapshot: ProductSnapshot) -> list[dict]:
+    rows = snapshot.select(snapshot.col('stock_qty') < 3, order_by=('department', 'name'))
+    # У колонці "Кількість" — поточний залишок
+    return [{
+        'article': r['article'],
+        'name': r['name'],
+        'quantity': int(r['stock_qty']),
+        'department': r['department'],
+        'supplier': r['supplier'] or None
+    } for r in rows]
+
+
+def _top_sales_items(snapshot: ProductSnapshot) -> list[dict]:
+    return [{
+        'article': r['article'],
+        'name': f"{r['name']} ({r['sales_sum']:.0f} грн)",
+        'quantity': int(r['sales_qty']),
+        'department': 'TOP-50_GLOBAL',  # Складаємо все в один файл
+        'supplier': r['supplier'] or None
+    } for r in snapshot.top('sales_sum', 50)]
+
+
+# назва звіту -> (дані зі знімка каталогу, режим групування файлів)
+REPORTS = {
+    'auto_order_department': (lambda snapshot: _auto_order_items(snapshot, 'department'), 'department'),
+    'auto_order_supplier': (lambda snapshot: _auto_order_items(snapshot, 'supplier'), 'supplier'),
+    'low_stock': (_low_stock_items, 'department'),
+    'top_sales': (_top_sales_items, 'department'),
+}
+
+
+class ReportService:
+    """
+    Готові файли аналітичних звітів. Для одного покоління даних звіт однаковий для
+    всіх керівників, тож після імпорту всі звіти будуються один раз у фоні й
+    лежать у пам'яті (кеш обмежений за сумарним розміром файлів). Якщо звіту в кеші
+    немає (витіснений, ще будується, бот щойно запущено) — будується на вимогу.
+    Звіти магазину (store_id) рахуються по його залишках і кешуються під версією його імпорту.
+    """
+
+    def __init__(self):
+        # (назва, покоління) -> {'rows': кількість позицій, 'files': [(ім'я файлу, байти)], 'size': байт}
+        self._cache: OrderedDict[tuple, dict] = OrderedDict()
+        self._size = 0
+        self._tasks: set[asyncio.Task] = set()
+
+    def schedule_build(self):
+        """Фонова побудова всіх звітів для поточного покоління (викликається після імпорту)"""
+        task = asyncio.create_task(self.build_all())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def build_all(self):
+        for name in REPORTS:
+            try:
+                await self.get(name)
+            except Exception as e:
+                logger.error(f"Report {name} build failed: {e}")
+        logger.info(f"📑 Reports ready for generation {importer.generation}: {len(self._cache)} cached, {self._size} bytes")
+
+    async def get(self, name: str, store_id: int | None = None) -> dict:
+        # Покоління — з Redis: імпорт міг пройти в іншому процесі
+        key = (name, await importer.current_generation())
+        if store_id is not None:
+            key = (f"{name}@{store_id}.{await store_stock.version(store_id)}", key[1])
+        artifact = self._cache.get(key)
+        if artifact is not None:
+            self._cache.move_to_end(key)
+            return artifact
+
+        # Одночасні натискання (і фонова побудова) чекають одне обчислення
+        artifact = await single_flight.run(f"report:{key[0]}:{key[1]}", lambda: self._build(name, key[1], store_id))
+        # Імпорт міг пройти, поки будували, — тоді звіт уже застарів і в кеш не йде
+        if key[1] == await importer.current_generation():
+            self._store(key, artifact)
+        return artifact
+
+    async def _build(self, name: str, generation: int, store_id: int | None = None) -> dict:
+        load_items, mode = REPORTS[name]
+        if store_id is None:
+            snapshot = await product_snapshot.get(generation)
+        else:
+            snapshot = await store_stock.snapshot(store_id)
+        items = load_items(snapshot)
+        files = []
+        if items:
+            paths = await exporter.generate_order_files(items, grouping_mode=mode, user_id=0)
+            try:
+                for path in paths:
+                    with open(path, 'rb') as f:
+                        files.append((os.path.basename(path), f.read()))
+            finally:
+                exporter.cleanup(paths)
+        return {'rows': len(items), 'files': files, 'size': sum(len(data) for _, data in files)}
+
+    def _store(self, key: tuple, artifact: dict):
+        # Звіти попередніх поколінь більше не знадобляться
+        for old in [k for k in self._cache if k[1] != key[1]]:
+            self._size -= self._cache.pop(old)['size']
+
+        self._cache[key] = artifact
+        self._size += artifact['size']
+        while self._size > config.REPORT_CACHE_MAX_BYTES and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            self._size -= evicted['size']
+
+
+report_service = ReportService()
@@ -0,0 +1,53 @@
+from aiogram.types import InlineKeyboardMarkup
+
+from src.config import config
+from src.services.importer import importer
+from src.utils.cache import TTLCache
+
+
+class ScreenCache:
+    """
+    Кеш відрендерених екранів каталогу: (шлях, сторінка, роль) -> (текст, клавіатура).
+    Для одного покоління даних екран однаковий для всіх, тож БД і InlineKeyboardBuilder
+    потрібні лише при першому відкритті. Новий імпорт скидає кеш повністю.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(maxsize=config.SCREEN_CACHE_SIZE, ttl=config.SCREEN_CACHE_TTL)
+        self._generation = importer.generation
+
+    def _check_generation(self):
+        if self._generation != importer.generation:
+            self._cache.clear()
+            self._generation = importer.generation
+
+    def get(self, path: str, page: int = 0, role: str | None = None) -> tuple[str, InlineKeyboardMarkup] | None:
+        self._check_generation()
+        entry = self._cache.get((path, page, role))
+        if entry is None:
+            return None
+        text, markup_json = entry
+        return text, InlineKeyboardMarkup.model_validate_json(markup_json)
+
+    def get_quiet(self, path: str, page: int = 0, role: str | None = None) -> tuple[str, InlineKeyboardMarkup] | None:
+        """Як get, але не впливає на LRU-порядок і метрики (для фонового прогрівання)"""
+        self._check_generation()
+        entry = self._cache.peek((path, page, role))
+        if entry is None:
+            return None
+        text, markup_json = entry
+        return text, InlineKeyboardMarkup.model_validate_json(markup_json)
+
+    def set(self, path: str, page: int, role: str | None, text: str, markup: InlineKeyboardMarkup):
+        self._check_generation()
+        self._cache.set((path, page, role), (text, markup.model_dump_json(exclude_none=True)))
+
+    def __contains__(self, key: tuple) -> bool:
+        self._check_generation()
+        return key in self._cache
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+screen_cache = ScreenCache()
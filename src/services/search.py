@@ -0,0 +1,77 @@
+from src.config import config
+from src.database.db import db
+from src.services.importer import importer
+from src.services.search_index import normalize, search_index
+from src.utils.cache import TTLCache
+
+# Скільки результатів тягнемо в кеш за раз (максимум для inline-відповіді Telegram)
+FETCH_LIMIT = 50
+
+
+class SearchService:
+    """
+    Єдина точка пошуку товарів (FSM-пошук у каталозі та inline-режим).
+    Тримає LRU недавніх запитів: якщо для префікса запиту вже є повний
+    (менше FETCH_LIMIT) набір результатів, уточнений запит фільтрується в пам'яті.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(maxsize=config.SEARCH_CACHE_SIZE, ttl=config.SEARCH_CACHE_TTL)
+        self._generation = importer.generation
+
+    def _use_index(self) -> bool:
+        return config.SEARCH_BACKEND == "index" and search_index.ready
+
+    def _key(self, query: str) -> str:
+        return normalize(query) if self._use_index() else query.strip().casefold()
+
+    def _matches(self, key: str, item) -> bool:
+        if self._use_index():
+            text = normalize(f"{item['name']} {item['article']}")
+            return all(token in text for token in key.split())
+        return key in str(item['name'] or '').casefold() or key in str(item['article']).casefold()
+
+    async def search(self, query: str, limit: int = 20) -> list:
+        # Новий імпорт — кеш застарів
+        if self._generation != importer.generation:
+            self._cache.clear()
+            self._generation = importer.generation
+
+        key = self._key(query)
+        if not key:
+            return []
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached[:limit]
+
+        # Шукаємо найдовший закешований префікс з повним набором результатів
+        for end in range(len(key) - 1, 1, -1):
+            prefix_items = self._cache.peek(key[:end])
+            if prefix_items is not None and len(prefix_items) < FETCH_LIMIT:
+                items = [item for item in prefix_items if self._matches(key, item)]
+                self._cache.set(key, items)
+                return items[:limit]
+
+        items = await self._fetch(query)
+        self._cache.set(key, items)
+        return items[:limit]
+
+    async def _fetch(self, query: str) -> list:
+        if self._use_index():
+            return search_index.search(query, limit=FETCH_LIMIT)
+
+        sql = """
+            SELECT article, name, stock_qty, unit_price
+            FROM products
+            WHERE name ILIKE $1 OR article ILIKE $1
+            LIMIT $2
+        """
+        rows = await db.fetch_all(sql, f"%{query.strip()}%", FETCH_LIMIT)
+        return [dict(r) for r in rows]
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+search_service = SearchService()
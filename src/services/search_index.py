@@ -0,0 +1,286 @@
+import asyncio
+import re
+from array import array
+
+import numpy as np
+from loguru import logger
+
+from src.database.db import db
+
+# Транслітерація (спрощена КМУ-2010, без позиційних правил) + кілька російських літер
+TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "h", "ґ": "g", "д": "d", "е": "e", "є": "ie",
+    "ж": "zh", "з": "z", "и": "y", "і": "i", "ї": "i", "й": "i", "к": "k", "л": "l",
+    "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ь": "", "ю": "iu",
+    "я": "ia", "ы": "y", "э": "e", "ё": "e", "ъ": "", "'": "", "’": "", "ʼ": "",
+})
+
+NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# Індексуються підрядки довжиною 1..NGRAM: слова запиту, коротші за NGRAM, шукаються як цілий n-грам
+NGRAM = 3
+
+
+def normalize(text: str) -> str:
+    """Регістр -> транслітерація -> лише [a-z0-9], слова через пробіл"""
+    text = str(text or "").casefold().translate(TRANSLIT)
+    return NON_ALNUM.sub(" ", text).strip()
+
+
+def ngrams(token: str) -> set[str]:
+    """Усі підрядки слова довжиною 1..NGRAM (для індексу)"""
+    return {token[i:i + n] for n in range(1, NGRAM + 1) for i in range(len(token) - n + 1)}
+
+
+def query_grams(token: str) -> set[str]:
+    """n-грами слова запиту: NGRAM-грами, а коротке слово — саме є n-грамом індексу"""
+    if len(token) < NGRAM:
+        return {token}
+    return {token[i:i + NGRAM] for i in range(len(token) - NGRAM + 1)}
+
+
+class _Segment:
+    """
+    Незмінний (після побудови) сегмент постингів у форматі CSR:
+    grams[gram] -> слот, postings[offsets[slot]:offsets[slot + 1]] -> відсортовані doc_id.
+    """
+
+    def __init__(self, grams: dict, offsets: np.ndarray, postings: np.ndarray):
+        self.grams = grams
+        self.offsets = offsets
+        self.postings = postings
+
+    def get(self, gram: str) -> np.ndarray | None:
+        slot = self.grams.get(gram)
+        if slot is None:
+            return None
+        return self.postings[self.offsets[slot]:self.offsets[slot + 1]]
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.postings.nbytes
+
+
+class _IndexState:
+    """Документи + базовий сегмент + дельта (для інкрементальних імпортів)"""
+
+    def __init__(self):
+        self.articles: list[str] = []
+        self.names: list[str] = []
+        self.stock_qty = array("d")
+        self.unit_price = array("d")
+        self.by_article: dict[str, int] = {}
+        self.dead: set[int] = set()
+        self.base = _Segment({}, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.uint32))
+        self.base_docs = 0
+        self.delta: dict[str, list[int]] = {}
+
+    def add_doc(self, article: str, name: str, stock_qty: float, unit_price: float) -> int:
+        doc_id = len(self.articles)
+        self.articles.append(article)
+        self.names.append(name)
+        self.stock_qty.append(stock_qty)
+        self.unit_price.append(unit_price)
+        return doc_id
+
+    def copy(self) -> "_IndexState":
+        """Копія для інкрементального оновлення: пошук тим часом читає незмінний оригінал"""
+        state = _IndexState()
+        state.articles = self.articles.copy()
+        state.names = self.names.copy()
+        state.stock_qty = array("d", self.stock_qty)
+        state.unit_price = array("d", self.unit_price)
+        state.by_article = self.by_article.copy()
+        state.dead = self.dead.copy()
+        state.base = self.base
+        state.base_docs = self.base_docs
+        state.delta = {gram: doc_ids.copy() for gram, doc_ids in self.delta.items()}
+        return state
+
+    def postings(self, gram: str) -> np.ndarray:
+        base = self.base.get(gram)
+        delta = self.delta.get(gram)
+        if delta:
+            tail = np.asarray(delta, dtype=np.uint32)
+            return tail if base is None else np.concatenate((base, tail))
+        return base if base is not None else np.zeros(0, dtype=np.uint32)
+
+
+def _build_state(rows) -> _IndexState:
+    """Повна побудова індексу з ітерованих (article, name, stock_qty, unit_price)"""
+    state = _IndexState()
+    grams: dict[str, int] = {}
+    gram_ids = array("I")
+    doc_ids = array("I")
+
+    for article, name, stock_qty, unit_price in rows:
+        doc_id = state.add_doc(article, name, stock_qty, unit_price)
+        state.by_article[article] = doc_id
+        doc_grams = set()
+        for token in normalize(f"{name} {article}").split():
+            doc_grams |= ngrams(token)
+        for gram in doc_grams:
+            gram_ids.append(grams.setdefault(gram, len(grams)))
+            doc_ids.append(doc_id)
+
+    gram_arr = np.frombuffer(gram_ids, dtype=np.uint32)
+    doc_arr = np.frombuffer(doc_ids, dtype=np.uint32)
+    # Стабільне сортування зберігає зростання doc_id всередині кожного n-грама
+    order = np.argsort(gram_arr, kind="stable")
+    offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(gram_arr, minlength=len(grams)), out=offsets[1:])
+
+    state.base = _Segment(grams, offsets, doc_arr[order].copy())
+    state.base_docs = len(state.articles)
+    return state
+
+
+class SearchIndex:
+    """
+    In-memory n-грамний інвертований індекс по назві та артикулу.
+    Будується з фінального DataFrame імпорту, при повторних імпортах оновлюється інкрементально:
+    змінені/нові товари потрапляють у дельту, старі версії позначаються видаленими.
+    """
+
+    # Коли дельта стає завеликою — перебудовуємо базовий сегмент
+    COMPACT_RATIO = 0.1
+    COMPACT_MIN = 20000
+
+    def __init__(self):
+        self._state: _IndexState | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._state is not None
+
+    async def load_from_db(self):
+        """Початкова побудова при старті бота"""
+        records = await db.fetch_all("SELECT article, name, stock_qty, unit_price FROM products")
+        rows = [(r['article'], r['name'] or '', float(r['stock_qty'] or 0), float(r['unit_price'] or 0)) for r in records]
+        async with self._lock:
+            self._state = await asyncio.to_thread(_build_state, rows)
+        logger.info(f"🔎 Search index built: {self.stats()}")
+
+    async def update(self, df):
+        """Застосовує результат імпорту (DataFrame з article, name, stock_qty, stock_sum)"""
+        zeros = np.zeros(len(df))
+        stock_qty = df['stock_qty'].to_numpy(dtype=float) if 'stock_qty' in df.columns else zeros
+        stock_sum = df['stock_sum'].to_numpy(dtype=float) if 'stock_sum' in df.columns else zeros
+        # Та сама формула, що й у згенерованій колонці products.unit_price
+        unit_price = np.divide(stock_sum, stock_qty, out=zeros.copy(), where=stock_qty > 0)
+        rows = list(zip(
+            df['article'].astype(str),
+            df['name'].astype(str) if 'name' in df.columns else [''] * len(df),
+            stock_qty.tolist(),
+            unit_price.tolist(),
+        ))
+        async with self._lock:
+            if self._state is None:
+                self._state = await asyncio.to_thread(_build_state, rows)
+            else:
+                # Дельта будується на копії в потоці і підміняється цілком
+                self._state = await asyncio.to_thread(self._apply_delta, self._state.copy(), rows)
+                if self._needs_compaction(self._state):
+                    self._state = await asyncio.to_thread(_build_state, self._live_rows(self._state))
+        logger.info(f"🔎 Search index updated: {self.stats()}")
+
+    def _apply_delta(self, state: _IndexState, rows) -> _IndexState:
+        for article, name, stock_qty, unit_price in rows:
+            doc_id = state.by_article.get(article)
+            if doc_id is not None and state.names[doc_id] == name:
+                # Текст не змінився — лише оновлюємо дані картки
+                state.stock_qty[doc_id] = stock_qty
+                state.unit_price[doc_id] = unit_price
+                continue
+
+            new_id = state.add_doc(article, name, stock_qty, unit_price)
+            doc_grams = set()
+            for token in normalize(f"{name} {article}").split():
+                doc_grams |= ngrams(token)
+            for gram in doc_grams:
+                state.delta.setdefault(gram, []).append(new_id)
+            state.by_article[article] = new_id
+            if doc_id is not None:
+                state.dead.add(doc_id)
+        return state
+
+    def _needs_compaction(self, state: _IndexState) -> bool:
+        delta_docs = len(state.articles) - state.base_docs
+        return delta_docs > max(self.COMPACT_MIN, state.base_docs * self.COMPACT_RATIO)
+
+    def _live_rows(self, state: _IndexState):
+        for doc_id in sorted(state.by_article.values()):
+            yield state.articles[doc_id], state.names[doc_id], state.stock_qty[doc_id], state.unit_price[doc_id]
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        """Усі слова запиту мають входити в назву/артикул (як підрядки)"""
+        state = self._state
+        if state is None:
+            return []
+
+        # Слово запиту з розділовими знаками ("2.5") шукається цілком: "2 5" після нормалізації
+        tokens = [t for t in (normalize(word) for word in query.split()) if t]
+        if not tokens:
+            return []
+
+        grams = set()
+        for token in tokens:
+            for part in token.split():
+                grams |= query_grams(part)
+
+        lists = sorted((state.postings(g) for g in grams), key=len)
+        candidates = self._intersect_chunks(lists)
+
+        results = []
+        seen = set()
+        for doc_id in candidates:
+            if doc_id in state.dead or doc_id in seen:
+                continue
+            seen.add(doc_id)
+            text = normalize(f"{state.names[doc_id]} {state.articles[doc_id]}")
+            if all(token in text for token in tokens):
+                results.append({
+                    'article': state.articles[doc_id],
+                    'name': state.names[doc_id],
+                    'stock_qty': state.stock_qty[doc_id],
+                    'unit_price': state.unit_price[doc_id],
+                })
+                if len(results) >= limit:
+                    break
+        return results
+
+    def _intersect_chunks(self, lists, chunk: int = 256):
+        """
+        Ліниво перетинає відсортовані постинги: йдемо найкоротшим списком порціями
+        і перевіряємо входження в решту через searchsorted. Нам потрібні лише перші
+        `limit` збігів, тож повний перетин великих списків не рахуємо.
+        """
+        head, rest = lists[0], lists[1:]
+        for start in range(0, len(head), chunk):
+            part = head[start:start + chunk]
+            for postings in rest:
+                if not len(postings):
+                    return
+                pos = np.searchsorted(postings, part)
+                pos[pos >= len(postings)] = len(postings) - 1
+                part = part[postings[pos] == part]
+                if not len(part):
+                    break
+            yield from part.tolist()
+
+    def stats(self) -> str:
+        state = self._state
+        if state is None:
+            return "empty"
+        live = len(state.by_article)
+        delta = sum(len(v) for v in state.delta.values())
+        return (
+            f"docs={live}, grams={len(state.base.grams)}, "
+            f"postings={len(state.base.postings)}+{delta}, "
+            f"base={state.base.nbytes / 1024 / 1024:.1f} MB"
+        )
+
+
+search_index = SearchIndex()
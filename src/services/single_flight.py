@@ -0,0 +1,79 @@
+import asyncio
+import pickle
+import uuid
+from typing import Any, Awaitable, Callable
+
+from loguru import logger
+
+from src.config import config
+from src.database.redis_cache import redis
+
+# Знімає блокування, лише якщо воно досі наше
+RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+POLL_INTERVAL = 0.2
+
+
+class SingleFlight:
+    """
+    Одне обчислення на сигнатуру запиту. Однакові одночасні запити в процесі чекають
+    той самий Future; між процесами — Redis-блокування sf:lock:<key>: хто його взяв,
+    рахує і кладе результат у sf:result:<key> (на SINGLE_FLIGHT_RESULT_TTL), решта
+    чекають цей результат. Усі отримують один і той самий результат.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._release = redis.register_script(RELEASE_LUA)
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._run_locked(key, compute)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # помилку отримають очікувачі; без них — не попереджати
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _run_locked(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        lock_key, result_key = f"sf:lock:{key}", f"sf:result:{key}"
+        token = uuid.uuid4().hex
+        waiting = False
+        while True:
+            cached = await redis.get(result_key)
+            if cached is not None:
+                return pickle.loads(cached)
+
+            if await redis.set(lock_key, token, nx=True, ex=config.SINGLE_FLIGHT_LOCK_TTL):
+                try:
+                    result = await compute()
+                    await redis.set(result_key, pickle.dumps(result), ex=config.SINGLE_FLIGHT_RESULT_TTL)
+                    return result
+                finally:
+                    await self._release(keys=[lock_key], args=[token])
+
+            # Рахує інший процес — чекаємо його результат (або звільнення блокування)
+            if not waiting:
+                logger.debug(f"Single-flight {key}: waiting for another worker")
+                waiting = True
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+single_flight = SingleFlight()
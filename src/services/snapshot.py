@@ -0,0 +1,153 @@
+import asyncio
+import time
+
+import numpy as np
+from loguru import logger
+
+from src.database.db import db
+from src.services.replenishment import recommend
+
+# Критичний залишок: нижче нього товар з продажами замовляється щонайменше на MIN_RECOMMENDED
+CRITICAL_STOCK = 3
+MIN_RECOMMENDED = 2
+
+NUMERIC_COLUMNS = ['department', 'stock_qty', 'stock_sum', 'sales_qty', 'sales_sum', 'pack_size']
+# Колонки зі словниковим кодуванням: codes[i] -> values[codes[i]]
+ENCODED_COLUMNS = ['name', 'supplier']
+
+
+def _encode(values: list) -> tuple[np.ndarray, np.ndarray]:
+    """Словникове кодування рядкової колонки: (словник, коди uint32)"""
+    dictionary, codes = np.unique(np.asarray([v or '' for v in values], dtype=object), return_inverse=True)
+    return dictionary, codes.astype(np.uint32)
+
+
+class ProductSnapshot:
+    """
+    Незмінний колонковий знімок products: по NumPy-масиву на колонку, рядок i — товар i.
+    Фільтр — булева маска над колонками (snap.col('stock_qty') < 3), далі top/select/group_sum.
+    """
+
+    def __init__(self, columns: dict):
+        self.size = len(columns['article'])
+        self.articles = np.asarray(columns['article'], dtype=object)
+        # NULL приходить як None -> NaN, у звітах він означає 0
+        self.numeric = {
+            name: np.nan_to_num(np.asarray(columns[name], dtype=np.float64)) if self.size else np.zeros(0)
+            for name in NUMERIC_COLUMNS
+        }
+        self.numeric['department'] = self.numeric['department'].astype(np.int64)
+        self.encoded = {name: _encode(columns[name]) for name in ENCODED_COLUMNS}
+        self.numeric['recommended_qty'] = recommend(
+            self.numeric['stock_qty'], self.numeric['sales_qty'], self.numeric['pack_size'],
+            critical_stock=CRITICAL_STOCK, min_qty=MIN_RECOMMENDED
+        ) if self.size else np.zeros(0, dtype=np.int64)
+
+    def col(self, name: str) -> np.ndarray:
+        """Числова колонка або коди закодованої"""
+        if name in self.encoded:
+            return self.encoded[name][1]
+        return self.numeric[name]
+
+    def code(self, column: str, value: str) -> int:
+        """Код значення закодованої колонки (-1, якщо такого немає) — для масок на кшталт col('supplier') == code"""
+        dictionary = self.encoded[column][0]
+        pos = int(np.searchsorted(dictionary, value))
+        return pos if pos < len(dictionary) and dictionary[pos] == value else -1
+
+    def select(self, mask: np.ndarray | None = None, order_by: tuple | list = (), limit: int | None = None) -> list[dict]:
+        """
+        Рядки за маскою як список dict. order_by — назви колонок; '-col' — за спаданням.
+        Закодовані колонки сортуються за значенням (словник відсортований, тож за кодом).
+        """
+        rows = np.flatnonzero(mask) if mask is not None else np.arange(self.size)
+        if order_by:
+            keys = []
+            for name in reversed(order_by):
+                column = self.col(name.lstrip('-'))[rows]
+                keys.append(-column.astype(np.float64) if name.startswith('-') else column)
+            rows = rows[np.lexsort(keys)]
+        if limit is not None:
+            rows = rows[:limit]
+        return self._rows(rows)
+
+    def top(self, column: str, n: int, mask: np.ndarray | None = None) -> list[dict]:
+        """N рядків з найбільшим значенням колонки (argpartition, без повного сортування)"""
+        rows = np.flatnonzero(mask) if mask is not None else np.arange(self.size)
+        values = self.col(column)[rows]
+        if len(rows) > n:
+            part = np.argpartition(-values, n - 1)[:n]
+            rows, values = rows[part], values[part]
+        return self._rows(rows[np.argsort(-values, kind='stable')])
+
+    def group_sum(self, by: str, column: str, mask: np.ndarray | None = None) -> dict:
+        """{значення групи: сума колонки} — для закодованих колонок ключ уже розкодований"""
+        keys, values = self.col(by), self.col(column)
+        if mask is not None:
+            keys, values = keys[mask], values[mask]
+        groups, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=values, minlength=len(groups))
+        if by in self.encoded:
+            groups = self.encoded[by][0][groups]
+        return dict(zip(groups.tolist(), sums.tolist()))
+
+    def _rows(self, rows: np.ndarray) -> list[dict]:
+        """Розкодовує вибрані рядки: колонка за колонкою (векторно), а не поелементно"""
+        names = ['article', *self.encoded, *self.numeric]
+        columns = [self.articles[rows].tolist()]
+        columns += [dictionary[codes[rows]].tolist() for dictionary, codes in self.encoded.values()]
+        columns += [column[rows].tolist() for column in self.numeric.values()]
+        return [dict(zip(names, values)) for values in zip(*columns)]
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            sum(c.nbytes for c in self.numeric.values())
+            + sum(d.nbytes + c.nbytes for d, c in self.encoded.values())
+            + self.articles.nbytes
+        )
+
+
+class SnapshotService:
+    """
+    Колонковий знімок каталогу в пам'яті для аналітики. Будується одним запитом
+    (по масиву на колонку) в кінці імпорту і підміняється цілком: читачі, що вже
+    взяли знімок, дочитують старий, нові отримують новий. Звіти (мало залишку,
+    ТОП продажів, автозамовлення) рахуються по ньому без запитів до БД.
+    """
+
+    def __init__(self):
+        self._snapshot: ProductSnapshot | None = None
+        # Покоління імпорту, для якого побудовано знімок
+        self._generation: int | None = None
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, generation: int | None = None) -> ProductSnapshot:
+        async with self._lock:
+            started = time.perf_counter()
+            columns = await db.fetch_one(f"""
+                SELECT array_agg(article) AS article,
+                       {', '.join(f'array_agg({c}) AS {c}' for c in ENCODED_COLUMNS + NUMERIC_COLUMNS)}
+                FROM products
+            """)
+            columns = {k: v or [] for k, v in dict(columns).items()}
+            snapshot = await asyncio.to_thread(ProductSnapshot, columns)
+            self._snapshot = snapshot
+            self._generation = generation
+        logger.info(
+            f"🧊 Product snapshot: {snapshot.size} rows, {snapshot.nbytes / 1024 / 1024:.1f} MB, "
+            f"{(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        return snapshot
+
+    async def get(self, generation: int | None = None) -> ProductSnapshot:
+        """
+        Поточний знімок (при першому зверненні після старту — будується).
+        generation — покоління імпорту: якщо імпорт пройшов в іншому процесі, знімок перебудовується.
+        """
+        if self._snapshot is None or (generation is not None and generation != self._generation):
+            return await self.refresh(generation)
+        return self._snapshot
+
+
+product_snapshot = SnapshotService()
@@ -0,0 +1,92 @@
+import asyncio
+import re
+
+from loguru import logger
+
+from src.database.db import db
+from src.database.redis_cache import redis
+from src.services.cart_store import cart_store
+from src.services.importer import COLUMN_MAPPING, read_table, to_numeric
+from src.services.snapshot import ENCODED_COLUMNS, NUMERIC_COLUMNS, ProductSnapshot
+
+STORE_COLUMNS = ['store_id', 'article', 'sales_qty', 'sales_sum', 'stock_qty', 'stock_sum']
+# Файл залишків магазину впізнається за назвою: store_12.xlsx, import-store12.csv, ...
+# "store" — окреме слово: restore_2024.xlsx — це каталог, а не магазин 2024
+STORE_FILE = re.compile(r"(?<![a-z0-9])store[_-]?(\d+)", re.IGNORECASE)
+
+
+def store_from_filename(file_name: str) -> int | None:
+    match = STORE_FILE.search(file_name)
+    return int(match.group(1)) if match else None
+
+
+class StoreStockService:
+    """
+    Залишки та продажі окремих магазинів (файли магазинів). Таблиця store_stock
+    секціонована по магазину (LIST), тож імпорт магазину — TRUNCATE + COPY лише його
+    секції, а запити з store_id = $1 читають одну секцію: вартість пропорційна даним
+    одного магазину, а не магазини × товари. Довідник товарів — спільний (products).
+    """
+
+    def __init__(self):
+        # Рядки кошиків магазину, урізані після його останнього імпорту
+        self.cart_adjustments = []
+
+    @staticmethod
+    def _version_key(store_id: int) -> str:
+        return f"store_stock:version:{store_id}"
+
+    async def version(self, store_id: int) -> int:
+        """Лічильник імпортів магазину (спільний для всіх процесів) — для ключів кешу звітів"""
+        return int(await redis.get(self._version_key(store_id)) or 0)
+
+    async def import_file(self, file_path: str, store_id: int) -> int:
+        df = await asyncio.to_thread(read_table, file_path)
+        df = df.rename(columns=COLUMN_MAPPING)
+        if 'article' not in df.columns:
+            raise ValueError(f"У файлі відсутня колонка 'Артикул'. Знайдені колонки: {list(df.columns)}")
+
+        df = df.dropna(subset=['article'])
+        df['article'] = df['article'].astype(str)
+        df = to_numeric(df).drop_duplicates(subset='article', keep='last')
+        columns = [[store_id] * len(df), df['article'].tolist()]
+        for col in STORE_COLUMNS[2:]:
+            columns.append(df[col].astype(float).tolist() if col in df.columns else [0.0] * len(df))
+
+        partition = f"store_stock_{int(store_id)}"
+        async with db.pool.acquire() as connection:
+            await connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS {partition}
+                PARTITION OF store_stock FOR VALUES IN ({int(store_id)})
+            """)
+            async with connection.transaction():
+                # TRUNCATE секції не чіпає інші магазини і не лишає мертвих рядків
+                await connection.execute(f"TRUNCATE {partition}")
+                await connection.copy_records_to_table(
+                    partition, records=list(zip(*columns)), columns=STORE_COLUMNS
+                )
+        await redis.incr(self._version_key(store_id))
+        logger.info(f"🏪 Store {store_id} stock loaded: {len(df)} rows")
+
+        # Кошики цього магазину — під нові залишки
+        self.cart_adjustments = await cart_store.reconcile(store_id=store_id)
+        await cart_store.rebuild_reservations()
+        return len(df)
+
+    async def snapshot(self, store_id: int) -> ProductSnapshot:
+        """Колонковий знімок асортименту магазину (залишки/продажі магазину, довідник — products)"""
+        own = {'stock_qty', 'stock_sum', 'sales_qty', 'sales_sum'}
+        aggregates = ', '.join(
+            f"array_agg({'s' if c in own else 'p'}.{c}) AS {c}" for c in ENCODED_COLUMNS + NUMERIC_COLUMNS
+        )
+        columns = await db.fetch_one(f"""
+            SELECT array_agg(p.article) AS article, {aggregates}
+            FROM store_stock s
+            JOIN products p ON p.article = s.article
+            WHERE s.store_id = $1
+        """, store_id)
+        columns = {k: v or [] for k, v in dict(columns).items()}
+        return await asyncio.to_thread(ProductSnapshot, columns)
+
+
+store_stock = StoreStockService()
@@ -0,0 +1,70 @@
+from loguru import logger
+
+from src.database.db import db
+
+SUMMARY_COLUMNS = ['product_count', 'stock_value', 'sales_value']
+
+
+class SummaryService:
+    """
+    Зведені цифри каталогу: по відділах, по постачальниках і загальні.
+    Рахуються одним агрегатним проходом по products (GROUPING SETS) у кінці імпорту,
+    тож дашборд і меню читають готові рядки (O(відділів)), а не сканують таблиці.
+    Кількість користувачів підтримує тригер users_count.
+    """
+
+    async def refresh(self):
+        rows = await db.fetch_all("""
+            SELECT GROUPING(department) = 0 AS is_department,
+                   GROUPING(coalesce(supplier, '')) = 0 AS is_supplier,
+                   department, coalesce(supplier, '') AS supplier,
+                   count(*) AS product_count,
+                   coalesce(sum(stock_sum), 0) AS stock_value,
+                   coalesce(sum(sales_sum), 0) AS sales_value
+            FROM products
+            GROUP BY GROUPING SETS ((department), (coalesce(supplier, '')), ())
+        """)
+
+        departments, suppliers, totals = [], [], None
+        for r in rows:
+            values = (r['product_count'], r['stock_value'], r['sales_value'])
+            if r['is_department']:
+                if r['department'] is not None:
+                    departments.append((r['department'], *values))
+            elif r['is_supplier']:
+                suppliers.append((r['supplier'], *values))
+            else:
+                totals = values
+
+        async with db.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute("DELETE FROM department_summary")
+                await connection.copy_records_to_table(
+                    'department_summary', records=departments, columns=['department'] + SUMMARY_COLUMNS
+                )
+                await connection.execute("DELETE FROM supplier_summary")
+                await connection.copy_records_to_table(
+                    'supplier_summary', records=suppliers, columns=['supplier'] + SUMMARY_COLUMNS
+                )
+                await connection.execute("""
+                    INSERT INTO summary_totals (key, value)
+                    SELECT * FROM unnest($1::text[], $2::double precision[])
+                    ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+                """, ['products', 'stock_value', 'sales_value'], [float(v) for v in totals or (0, 0, 0)])
+        logger.info(f"📊 Summary refreshed: {len(departments)} departments, {len(suppliers)} suppliers")
+
+    async def totals(self) -> dict:
+        """{'users', 'products', 'stock_value', 'sales_value'}"""
+        rows = await db.fetch_all("SELECT key, value FROM summary_totals")
+        totals = {'users': 0, 'products': 0, 'stock_value': 0.0, 'sales_value': 0.0}
+        totals.update({r['key']: r['value'] for r in rows})
+        return totals
+
+    async def departments(self) -> list:
+        return await db.fetch_all("SELECT * FROM department_summary ORDER BY department")
+
+    async def top_departments(self, limit: int = 5) -> list:
+        return await db.fetch_all("SELECT * FROM department_summary ORDER BY sales_value DESC LIMIT $1", limit)
+
+
+summary = SummaryService()
@@ -0,0 +1,73 @@
+from aiogram.types import User
+from loguru import logger
+
+from src.config import config
+from src.database.db import db
+from src.database.redis_cache import redis
+from src.utils.cache import TTLCache
+
+
+class UserCache:
+    """
+    Дворівневий кеш користувачів (роль та профіль):
+    L1 — TTL LRU в процесі, L2 — Redis hash user:<id>, далі — один UPSERT у Postgres.
+    """
+
+    FIELDS = ("user_id", "username", "full_name", "role", "store_id")
+
+    def __init__(self):
+        self._local = TTLCache(maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL)
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    async def resolve(self, user: User) -> dict:
+        cached = self._local.get(user.id)
+        if cached is not None:
+            return cached
+
+        try:
+            raw = await redis.hgetall(self._key(user.id))
+        except Exception as e:
+            logger.debug(f"User cache (redis) read failed: {e}")
+            raw = None
+
+        if raw:
+            db_user = {k.decode(): v.decode() for k, v in raw.items()}
+            db_user['user_id'] = int(db_user['user_id'])
+            db_user['store_id'] = int(db_user['store_id']) if db_user.get('store_id') else None
+        else:
+            db_user = await self._upsert(user)
+            try:
+                await redis.hset(self._key(user.id), mapping={k: v or '' for k, v in db_user.items()})
+                await redis.expire(self._key(user.id), config.USER_REDIS_TTL)
+            except Exception as e:
+                logger.debug(f"User cache (redis) write failed: {e}")
+
+        self._local.set(user.id, db_user)
+        return db_user
+
+    async def _upsert(self, user: User) -> dict:
+        """Реєстрація/оновлення профілю одним запитом. Адміни з конфігу завжди отримують роль admin."""
+        row = await db.fetch_one("""
+            INSERT INTO users (user_id, username, full_name, role)
+            VALUES ($1, $2, $3, CASE WHEN $4 THEN 'admin' ELSE 'shop' END)
+            ON CONFLICT (user_id) DO UPDATE SET
+                username = EXCLUDED.username,
+                full_name = EXCLUDED.full_name,
+                role = CASE WHEN $4 THEN 'admin' ELSE users.role END
+            RETURNING user_id, username, full_name, role, store_id
+        """, user.id, user.username, user.full_name, user.id in config.ADMIN_IDS)
+        return {k: row[k] for k in self.FIELDS}
+
+    async def invalidate(self, user_id: int):
+        """Скидає кешовану роль (наприклад, після зміни ролі адміном)"""
+        self._local.pop(user_id)
+        try:
+            await redis.delete(self._key(user_id))
+        except Exception as e:
+            logger.warning(f"User cache (redis) invalidation failed: {e}")
+
+
+user_cache = UserCache()
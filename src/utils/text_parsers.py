@@ -35,4 +35,33 @@ def clean_filename(name: str) -> str:
     """Очищає назву файлу"""
     clean = name.strip().replace(' ', '_')
     clean = re.sub(r'[^\w\s.-]', '', clean)
-    return clean
\ No newline at end of file
+    return clean
+
+INT32_MAX = 2**31 - 1
+
+ORDER_LINE = re.compile(r"^\s*([^\s;,]+)[\s;,]+(-?\d+)(?:[.,]0+)?\s*$")
+
+def parse_order_lines(lines: list[str], max_qty: int | None = None) -> tuple[dict[str, int], list[str], list[str]]:
+    """
+    Розбирає рядки виду "артикул кількість" (роздільник: пробіл, таб, ';' або ',').
+    Повторні артикули сумуються. Артикули із сумарною кількістю понад max_qty
+    (і понад int32 — межа колонки quantity) відкидаються.
+    Повертає ({article: qty}, [нерозпізнані рядки], ["артикул кількість" понад ліміт]).
+    """
+    pairs: dict[str, int] = {}
+    bad = []
+    for line in lines:
+        if not line.strip():
+            continue
+        match = ORDER_LINE.match(line)
+        if not match:
+            bad.append(line.strip())
+            continue
+        article, qty = match.group(1), int(match.group(2))
+        pairs[article] = pairs.get(article, 0) + qty
+
+    limit = INT32_MAX if max_qty is None else min(max_qty, INT32_MAX)
+    too_large = [f"{article} {qty}" for article, qty in pairs.items() if qty > limit]
+    for line in too_large:
+        del pairs[line.split(" ", 1)[0]]
+    return pairs, bad, too_large